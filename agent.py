@@ -1,22 +1,78 @@
 import logging
 from dotenv import load_dotenv
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Type
-import dateutil.parser
+from typing import AsyncIterable, Awaitable, Callable, Dict, List, Optional, Tuple
 from typing import Dict
 import asyncio
+import argparse
+import os
+import sys
 
-from livekit.agents import JobContext, WorkerOptions, cli
-from livekit.agents.llm import function_tool
-from livekit.agents.voice import Agent, AgentSession
-from livekit.plugins import deepgram, openai, elevenlabs, silero
+from livekit import rtc
+from livekit.agents import JobContext, JobProcess, WorkerOptions, cli
+from livekit.agents.llm import ChatChunk, ChatContext, ChatMessage, FunctionTool, StopResponse, ToolError, function_tool
+from livekit.agents.stt import SpeechEvent
+from livekit.agents.utils.aio import cancel_and_wait
+from livekit.agents.voice import Agent, AgentSession, ModelSettings, SpeechHandle
 from livekit import api
-from utils.validate_insuance import validate_insurance_eligibility, check_insurance_eligibility
+from utils.validate_insuance import validate_eligibility, close_stedi_client, verify_stedi
+from utils.admission import LOAD_THRESHOLD, request_job, worker_load
+from utils.batch_eligibility import BATCH_CONCURRENCY, BATCH_RATE_PER_SECOND, run_batch
+from utils.chat_context import DEFAULT_POLICY, ContextPolicy, trim_chat_ctx
+from utils.checkpoints import CHECKPOINT_FIELDS, caller_key, flush_checkpoints, get_checkpoint_store
+from utils.eligibility_cache import cached_check_insurance_eligibility, cached_eligibility_result
+from utils.eligibility_parser import eligibility_from_result
+from utils.eligibility_prefetch import EligibilityPrefetch, take_prefetch
+from utils.fast_path import fast_path_stats, match_confirmation, match_slot
+from utils.flow_graph import Branch, FlowGraph, FlowRunner, Node, confirmed
+from utils.hold_fillers import await_with_fillers, load_filler_schedule
+from utils.latency_metrics import (
+    NODE_TRANSITION, STEDI_REQUEST, attach_session_metrics, histograms, span, start_metrics_server, timed_tool
+)
+from utils.log_pipeline import fields, setup_logging
+from utils.normalize import normalize_date, normalize_member_id
+from utils.payer_index import get_payer_index, route_trading_partner
+from utils.providers import MIN_ENDPOINTING_DELAY, get_provider_pool, prewarm as prewarm_providers
+from utils.startup import Startup
+from utils.resilience import (
+    LLM_PROVIDER, STT_PROVIDER, TTS_PROVIDER, attach_session_breakers, get_dependency, open_circuits, provider_conn_options
+)
+from utils.tts_cache import get_tts_cache
 
 load_dotenv()
 logger = logging.getLogger("declarative-flow")
 logger.setLevel(logging.INFO)
 
+HOLD_MESSAGE = "Thank you. I am now checking your insurance information. Please hold."
+TRANSFER_MESSAGE = "Connecting to a human representative to help. Please stay on the line."
+GOODBYE_MESSAGE = "Thank you for verifying your insurance. Goodbye"
+RESUME_MESSAGE = "Welcome back. To pick up where we left off, I first need to confirm your date of birth."
+RESTART_MESSAGE = "Let's start from the beginning."
+# Spoken while a slow Stedi request is still running, see utils/hold_fillers.py
+FILLER_SCHEDULE = load_filler_schedule()
+
+
+def eligibility_request(state: Dict) -> Dict:
+    """Build the check_insurance_eligibility arguments from the collected session state"""
+    insurance_id = normalize_member_id(state.get("insurance_id", "")) or "AETNA12345"
+    retry_count = state.get("insurance_validation_retry_count", 0)
+    payer_attempt = state.get("payer_attempts", {}).get(insurance_id, 0)
+    return {
+        "first_name": state.get("first_name", "").lower().capitalize() or "Jane",
+        "last_name": state.get("last_name",  "").lower().capitalize() or "Doe",
+        "insurance_id": insurance_id,
+        "date_of_birth": state.get("date_of_birth", "20040404"),
+        "retry_count": retry_count,
+        # Re-checking the same ID goes to its next candidate payer; a corrected ID starts with its best match
+        "trading_partner_id": route_trading_partner(insurance_id, attempt=payer_attempt),
+    }
+
+
+def record_payer_attempt(state: Dict, insurance_id: str) -> None:
+    """Count a failed check of this ID, so the next one with the same ID tries another payer"""
+    attempts = state.setdefault("payer_attempts", {})
+    attempts[insurance_id] = attempts.get(insurance_id, 0) + 1
+
 
 @dataclass
 class SurveyData:
@@ -24,6 +80,10 @@ class SurveyData:
     responses: Dict[str, str] = field(default_factory=dict)
     current_stage: str = "stedi_send"
     path_taken: List[str] = field(default_factory=list)
+    prefetch: Optional[EligibilityPrefetch] = None
+    runner: Optional[FlowRunner] = None
+    # Hashed caller identity the call is checkpointed under, None when checkpointing is off
+    caller: Optional[str] = None
 
     def record(self, question: str, answer: str):
         self.responses[question] = answer
@@ -33,27 +93,112 @@ class BaseAgent(Agent):
     """Base agent setup with transition logic"""
     def __init__(self, job_context: JobContext, instructions: str) -> None:
         self.job_context = job_context
+        providers = get_provider_pool()
         super().__init__(
             instructions=instructions,
-            stt=deepgram.STT(),
-            llm=openai.LLM(model="gpt-4o-mini", timeout=29.0),
-            tts=elevenlabs.TTS(
-                voice_id="ODq5zmih8GrVes37Dizd",
-                model="eleven_multilingual_v2"),
-            vad=silero.VAD.load()
+            stt=providers.stt,
+            llm=providers.llm,
+            tts=providers.tts,
+            vad=providers.vad
         )
+
+    def say_cached(self, text: str) -> SpeechHandle:
+        """Say a fixed prompt, using pre-synthesized audio when it is cached"""
+        return get_tts_cache().say(self.session, text)
+
+    def fast_path(self, transcript: str) -> Optional[Callable[[], Awaitable[Optional[Agent]]]]:
+        """Return a direct tool call when the transcript is unambiguous, None to let the LLM decide"""
+        return None
+
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        call = self.fast_path(new_message.text_content or "")
+        if call is None:
+            return
+        # Run the tool ourselves and skip the LLM round trip for this turn
+        next_agent = await call()
+        if next_agent is not None:
+            self.session.update_agent(next_agent)
+        raise StopResponse()
+
+    @property
+    def runner(self) -> FlowRunner:
+        sd: SurveyData = self.session.userdata
+        if sd.runner is None:
+            sd.runner = new_flow_runner(self.job_context)
+        return sd.runner
+
+    def transfer_to_representative(self, reason: str) -> Agent:
+        """Skip the rest of the flow when a dependency is down instead of making the caller wait out timeouts"""
+        logger.warning(f"Transferring caller to a representative: {reason}")
+        self.session.state["needs_representative"] = True
+        self.session.state["current_node"] = "transfer_to_rep"
+        self.checkpoint()
+        return self.runner.agent_for("transfer_to_rep")
+
+    def checkpoint(self) -> None:
+        """Save the node just entered and the slots confirmed so far, see utils/checkpoints.py"""
+        sd: SurveyData = self.session.userdata
+        get_checkpoint_store().append(sd.caller, self.session.state["current_node"], self.session.state)
+
+    # The three nodes below are livekit's defaults with per-dependency connect options
+    # (utils/resilience.py) instead of the global APIConnectOptions.
+    async def stt_node(self, audio: AsyncIterable[rtc.AudioFrame], model_settings: ModelSettings) -> AsyncIterable[SpeechEvent]:
+        async with self.stt.stream(conn_options=provider_conn_options(STT_PROVIDER)) as stream:
+            async def forward_audio() -> None:
+                async for frame in audio:
+                    stream.push_frame(frame)
+
+            forward_task = asyncio.create_task(forward_audio())
+            try:
+                async for event in stream:
+                    yield event
+            finally:
+                await cancel_and_wait(forward_task)
+
+    async def llm_node(
+        self, chat_ctx: ChatContext, tools: List[FunctionTool], model_settings: ModelSettings
+    ) -> AsyncIterable[ChatChunk]:
+        if not get_dependency(LLM_PROVIDER).breaker.allow():
+            self.session.update_agent(self.transfer_to_representative("LLM circuit open"))
+            return
+        policy = CONTEXT_POLICIES.get(self.session.state.get("current_node"), DEFAULT_POLICY)
+        chat_ctx = trim_chat_ctx(chat_ctx, policy)
+        async with self.llm.chat(
+            chat_ctx=chat_ctx,
+            tools=tools,
+            tool_choice=model_settings.tool_choice,
+            conn_options=provider_conn_options(LLM_PROVIDER),
+        ) as stream:
+            async for chunk in stream:
+                yield chunk
+
+    async def tts_node(self, text: AsyncIterable[str], model_settings: ModelSettings) -> AsyncIterable[rtc.AudioFrame]:
+        async with self.tts.stream(conn_options=provider_conn_options(TTS_PROVIDER)) as stream:
+            async def forward_text() -> None:
+                async for chunk in text:
+                    stream.push_text(chunk)
+                stream.end_input()
+
+            forward_task = asyncio.create_task(forward_text())
+            try:
+                async for event in stream:
+                    yield event.frame
+            finally:
+                await cancel_and_wait(forward_task)
+
     async def transition(self) -> Optional[Agent]:
         current = self.session.state.get("current_node")
-        next_fn = flow.get(current, {}).get("next")
-        if not next_fn:
-            return None
-        next_node = next_fn(self.session.state)
-        if next_node is None:
-            return None
-        self.session.state["current_node"] = next_node
-        agent_cls: Type[Agent] = flow[next_node]["agent"]
-        newAgent = agent_cls(self.job_context)
-        return newAgent
+        # Only the voice pipeline; an open Stedi circuit is handled by Stedi_CheckAgent, and callers
+        # whose eligibility is cached never need Stedi at all
+        down = open_circuits((STT_PROVIDER, LLM_PROVIDER, TTS_PROVIDER))
+        if down:
+            return self.transfer_to_representative(f"{', '.join(down)} circuit open")
+        with span(NODE_TRANSITION, current):
+            next_node, next_agent = await self.runner.next_agent(current, self.session.state)
+            if next_node is not None:
+                self.session.state["current_node"] = next_node
+                self.checkpoint()
+            return next_agent
 
 class DataCollectorAgent(BaseAgent):
     """Generic data collecting agent. Collect one piece of information and transition"""
@@ -66,9 +211,18 @@ class DataCollectorAgent(BaseAgent):
         super().__init__(job_context=job_context, instructions=self.instructions)
     
     async def on_enter(self):
-        await self.session.say(self.question)
+        if self.session.state.pop("resumed", False):
+            self.say_cached(RESUME_MESSAGE)
+        await self.say_cached(self.question)
+
+    def fast_path(self, transcript: str) -> Optional[Callable[[], Awaitable[Optional[Agent]]]]:
+        value = match_slot(self.key, transcript)
+        if value is None:
+            return None
+        return lambda: self.collect(value)
     
     @function_tool
+    @timed_tool
     async def collect(self, value: str) -> Optional[Agent]:
         sd: SurveyData = self.session.userdata
         sd.record(self.label, value)
@@ -93,6 +247,22 @@ class Collect_InsuranceAgent(DataCollectorAgent):
     question = "What is your insurance id or number?"
     instructions = "Please tell me your insurance id or number."
 
+    @function_tool
+    @timed_tool
+    async def collect(self, value: str) -> Optional[Agent]:
+        sd: SurveyData = self.session.userdata
+        sd.record(self.label, value)
+        if normalize_member_id(value) is None:
+            # Let the LLM ask again instead of guessing what "hundred" means in an ID
+            raise ToolError(f"Could not read '{value}' as an insurance ID. Ask for it one character at a time.")
+        self.session.state[self.key] = value
+
+        # All four fields are known now, so start the Stedi check while the caller confirms
+        if sd.prefetch is not None:
+            sd.prefetch.cancel()
+        sd.prefetch = EligibilityPrefetch(eligibility_request(self.session.state))
+        return await self.transition()
+
 class Confirm_SpellbackAgent(BaseAgent):
     def __init__(self, job_context: JobContext) -> None:
         super().__init__(job_context=job_context, instructions="Confirm the information provided is correct by spelling it back")
@@ -107,27 +277,11 @@ class Confirm_SpellbackAgent(BaseAgent):
             return "empty"
             
         if is_insurance_id:
-            number_mapping = {
-                "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
-                "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9"
-            }
-            
-            words = value.lower().split()
-            result = []
-            
-            for word in words:
-                if word in number_mapping:
-                    # Convert number words to digits
-                    result.append(number_mapping[word])
-                else:
-                    # Keep non-number words as is
-                    result.append(word)    
-            # Join back into a string with no spaces between numbers
-            processed_value = "".join(result).upper()
-            print(processed_value)
-            return " ".join(processed_value)
+            processed_value = normalize_member_id(value)
+            logger.debug("spellback", extra=fields(insurance_id=processed_value))
+            return " ".join(processed_value) if processed_value else "empty"
         else:
-            print(" ".join(value.upper()))
+            logger.debug("spellback", extra=fields(value=value))
             return " ".join(value.upper())
     
     async def on_enter(self) -> None:
@@ -137,18 +291,16 @@ class Confirm_SpellbackAgent(BaseAgent):
         # Determine what to spellback based on current stage
         if "fname_confirm" in current_stage:
             value = self.session.state.get("first_name")
-            print(f"F_Name:\t {value}")
             spelled = self.spell_out(value)
             await self.session.say(f"I heard your first name as {value}, spelled {spelled}. Is that correct?")
         elif "lname_confirm" in current_stage:
             value = self.session.state.get("last_name")
-            print(f"L_Name:\t {value}")
             spelled = self.spell_out(value)
             await self.session.say(f"I heard your last name as {value}, spelled {spelled}. Is that correct?")
         elif "dob_confirm" in current_stage:
             # Use the raw date string that was stored
             value = self.session.state.get("dob_raw", "")
-            print(f"DOB Raw: {value}")
+            logger.debug("spellback", extra=fields(dob_raw=value))
             await self.session.say(f"I heard your date of birth as {value}. Is that correct?")
         elif "insurance_confirm" in current_stage:
             value = self.session.state.get("insurance_id")
@@ -159,10 +311,23 @@ class Confirm_SpellbackAgent(BaseAgent):
             self.session.state["insurance_id"] = processed_value
             await self.session.say(f"I heard your insurance ID as {self.session.state["insurance_id"]}, spelled {spelled}. Is that correct?")
     
+    def fast_path(self, transcript: str) -> Optional[Callable[[], Awaitable[Optional[Agent]]]]:
+        is_correct = match_confirmation(transcript)
+        if is_correct is None:
+            return None
+        return lambda: self.confirm(is_correct)
+
     @function_tool
+    @timed_tool
     async def confirm(self, is_correct: bool) -> Optional[Agent]:
         self.session.state["confirm"] = is_correct
 
+        sd: SurveyData = self.session.userdata
+        if not is_correct and self.session.state.get("current_node") == "insurance_confirm" and sd.prefetch is not None:
+            # Caller is correcting their insurance ID, the speculative check is stale
+            sd.prefetch.cancel()
+            sd.prefetch = None
+
         return await self.transition()
 
 class Collect_DOBAgent(DataCollectorAgent):
@@ -172,61 +337,93 @@ class Collect_DOBAgent(DataCollectorAgent):
     instructions = "Collect the user's date of birth in a format that can be converted to YYYYMMDD for the Stedi API."
 
     @function_tool
+    @timed_tool
     async def collect(self, value: str) -> Optional[Agent]:
         sd: SurveyData = self.session.userdata
         sd.record(self.label, value)
 
+        formatted_date = normalize_date(value)
+        if formatted_date is None:
+            # Let the LLM ask again instead of sending a bad date to Stedi
+            raise ToolError(f"Could not read '{value}' as a date of birth. Ask for month, day and year again.")
+
         self.session.state["string_date"] = value
-        parsed_date = dateutil.parser.parse(value)
-        formatted_date = parsed_date.strftime("%Y%m%d")
         self.session.state[self.key] = formatted_date
-        print(f"parsedDate: {self.session.state.get(self.key)}")
         self.session.state["dob_raw"] = value
-        print(f"rawDateStr: {self.session.state.get("dob_raw")}")
-        
+        logger.debug("Collected date of birth", extra=fields(date_of_birth=formatted_date, dob_raw=value))
+
+        if "resume_dob" in self.session.state:
+            return self.verify_resume(formatted_date)
         return await self.transition()
 
+    def verify_resume(self, date_of_birth: str) -> Agent:
+        """
+        A resumed call continues only if the caller gives the date of birth of the
+        call it resumes; anyone else on the same number starts over with nothing filled in.
+        """
+        expected = self.session.state.pop("resume_dob")
+        resume_to = self.session.state.pop("resume_to")
+        if date_of_birth != expected:
+            logger.info("Resumed caller's date of birth did not match, starting over")
+            for key in CHECKPOINT_FIELDS:
+                self.session.state.pop(key, None)
+            self.say_cached(RESTART_MESSAGE)
+            resume_to = flow.start
+        self.session.state["current_node"] = resume_to
+        self.checkpoint()
+        return self.runner.agent_for(resume_to)
+
 
 class Stedi_CheckAgent(BaseAgent):
     def __init__(self, job_context: JobContext) -> None:
         super().__init__(job_context=job_context, instructions="Check insurance information with Stedi API and inform user of the result")
     
     async def on_enter(self) -> None:
-        await self.session.say("Thank you. I am now checking your insurance information. Please hold.")
-        
-        first_name = self.session.state.get("first_name", "").lower().capitalize() or "Jane"
-        last_name = self.session.state.get("last_name",  "").lower().capitalize() or "Doe"
-        insurance_id = self.session.state.get("insurance_id", "AETNA12345")
-        insurance_id = "".join(insurance_id.split()) or "AETNA12345"
-        date_of_birth = self.session.state.get("date_of_birth", "20040404") 
-        
-        # Get current retry count from session state
-        retry_count = self.session.state.get("insurance_validation_retry_count", 0)
+        sd: SurveyData = self.session.userdata
+        request = eligibility_request(self.session.state)
+        retry_count = request["retry_count"]
+        # Branch flags from a previous pass must not decide this one
+        self.session.state["needs_representative"] = False
+        self.session.state["retry_validation"] = False
+
+        # Reuse the check started in Collect_InsuranceAgent if the confirmed details match
+        prefetch = take_prefetch(sd.prefetch, request)
+        sd.prefetch = None
         
-        # Call the external API function
-        api_result = await check_insurance_eligibility(
-            first_name=first_name,
-            last_name=last_name,
-            insurance_id=insurance_id,
-            date_of_birth=date_of_birth,
-            retry_count=retry_count
-        )
+        # Callers already verified by the pre-visit batch go straight to the result, no hold message
+        api_result = await cached_eligibility_result(**request) if prefetch is None else None
+        if api_result is None:
+            # Call the external API function, started before the hold message so the two overlap
+            if prefetch is not None:
+                request_task = prefetch.task
+            else:
+                request_task = asyncio.create_task(cached_check_insurance_eligibility(**request))
+            if not request_task.done():
+                # Queued, not awaited: the result message plays right after it
+                self.say_cached(HOLD_MESSAGE)
+            with span(STEDI_REQUEST, self.session.state.get("current_node")):
+                api_result = await await_with_fillers(request_task, self.say_cached, FILLER_SCHEDULE)
         
+        if api_result.get("error_type") == "circuit_open":
+            # Stedi is down, don't make the caller retry their details
+            self.session.update_agent(self.transfer_to_representative("Stedi circuit open"))
+            return
         if not api_result["success"]:
             # Handle API error
             if retry_count < 1:
                 await self.session.say("I'm sorry, but we encountered a technical problem verifying your insurance.")
                 self.session.state["needs_representative"] = True
-                print(f" need rep: \t{self.session.state.get('needs_representative')}")  # Fixed quotes
+                logger.info("Eligibility check failed", extra=fields(error_type=api_result.get("error_type")))
             else:
                 await self.session.say("I'm having trouble verifying your insurance information. Let's try again.")
                 self.session.state["insurance_verified"] = False
                 self.session.state["retry_validation"] = True
                 self.session.state["insurance_validation_retry_count"] = retry_count + 1
+                record_payer_attempt(self.session.state, request["insurance_id"])
         else:
             # Only process the response if the API call was successful
-            response_data = api_result["data"]
-            validation_result = validate_insurance_eligibility(response_data, retry_count)
+            eligibility = eligibility_from_result(api_result)
+            validation_result = validate_eligibility(eligibility, retry_count)
             
             # Store validation results in session state
             self.session.state["insurance_verified"] = validation_result["is_valid"]
@@ -242,27 +439,26 @@ class Stedi_CheckAgent(BaseAgent):
             # If we need to retry, increment the counter
             if validation_result["retry_validation"]:
                 self.session.state["insurance_validation_retry_count"] = retry_count + 1
+                record_payer_attempt(self.session.state, request["insurance_id"])
             
             # Communicate results to the user
             await self.session.say(validation_result["message"])
         
-        print(f"About to transition with needs_representative={self.session.state.get('needs_representative')}")
-        if self.session.state["retry_validation"]:
-            if self.session.state["insurance_validation_retry_count"] <= 1:
-                return Collect_InsuranceAgent(job_context=JobContext)
-            else:
-                return TransferToRepresentativeAgent(job_context=JobContext)
-        else:
-            
-            return EndingAgent(job_context=JobContext)
-        
+        logger.info("Eligibility check finished", extra=fields(
+            needs_representative=self.session.state.get("needs_representative"),
+            retry_validation=self.session.state.get("retry_validation"),
+        ))
+        next_agent = await self.transition()
+        if next_agent is not None:
+            self.session.update_agent(next_agent)
+
 
 class TransferToRepresentativeAgent(BaseAgent):
     def __init__(self, job_context: JobContext) -> None:
         super().__init__(job_context=job_context, instructions="Transfer the user to a representative")
     
     async def on_enter(self) -> None:
-        await self.session.say("Connecting to a human representative to help. Please stay on the line.")
+        await self.say_cached(TRANSFER_MESSAGE)
         await self.session.aclose()
         try: 
             await self.job_context.api.room.delete_room(
@@ -274,12 +470,12 @@ class TransferToRepresentativeAgent(BaseAgent):
 
     
 
-class EndingAgent(Agent):
+class EndingAgent(BaseAgent):
     def __init__(self, job_context: JobContext) -> None:
         super().__init__(job_context=job_context, instructions="Conclude the conversation with a friendly goodbye")
     
     async def on_enter(self) -> None:
-        await self.session.say("Thank you for verifying your insurance. Goodbye")
+        await self.say_cached(GOODBYE_MESSAGE)
         await self.session.aclose()
         try: 
             await self.job_context.api.room.delete_room(
@@ -288,69 +484,172 @@ class EndingAgent(Agent):
         except Exception as e:
             logger.error(f"Error deleting room: {e}")
 
-flow = {
-    "collect_fname": {
-        "agent": Collect_FirstNameAgent,
-        "next": lambda state: "fname_confirm"
-    },
-    "fname_confirm": {
-        "agent": Confirm_SpellbackAgent,
-        "next": lambda state: "collect_lname" if state.get("confirm", True) else "collect_fname"
-    },
-    "collect_lname": {
-        "agent": Collect_LastNameAgent,
-        "next": lambda state: "lname_confirm"
-    },
-    "lname_confirm": {
-        "agent": Confirm_SpellbackAgent,
-        "next": lambda state: "collect_dob" if state.get("confirm", True) else "collect_lname"
-    },
-    "collect_dob": {
-        "agent": Collect_DOBAgent,
-        "next": lambda state: "dob_confirm"
-    },
-    "dob_confirm": {
-        "agent": Confirm_SpellbackAgent,
-        "next": lambda state: "collect_insurance" if state.get("confirm", True) else "collect_dob"
-    },
-    "collect_insurance": {
-        "agent": Collect_InsuranceAgent,
-        "next": lambda state: "insurance_confirm"
-    },
-    "insurance_confirm": {
-        "agent": Confirm_SpellbackAgent,
-        "next": lambda state: "stedi_send" if state.get("confirm", True) else "collect_insurance"
-    },
-    "stedi_send": {
-        "agent": Stedi_CheckAgent,
-        "next": None,
-
-#TODO: look into why the flow bricks here. We walk through and call transition() fine and it makes it all the way to agent creation
-# then stops. 
-    #     "next": lambda state: "transfer_to_rep" if state.get("needs_representative", False) 
-    #             else "collect_insurance" if state.get("retry_validation", False)
-    #             else "goodbye"
-    # },
-    # "transfer_to_rep": {
-    #     "agent": TransferToRepresentativeAgent,
-    #     "next": None
-    # },
-    # "goodbye": {
-    #     "agent": EndingAgent,
-    #     "next": None
-    # }
-}
+
+def retry_insurance(state: Dict) -> bool:
+    """A failed validation gets one more pass through the insurance questions"""
+    return state.get("retry_validation", False) and state.get("insurance_validation_retry_count", 0) <= 1
+
+
+# Compiled (and validated) at import, see utils/flow_graph.py
+flow = FlowGraph(start="collect_fname", nodes={
+    "collect_fname": Node(Collect_FirstNameAgent, next="fname_confirm"),
+    "fname_confirm": Node(Confirm_SpellbackAgent, next=confirmed(then="collect_lname", otherwise="collect_fname")),
+    "collect_lname": Node(Collect_LastNameAgent, next="lname_confirm"),
+    "lname_confirm": Node(Confirm_SpellbackAgent, next=confirmed(then="collect_dob", otherwise="collect_lname")),
+    "collect_dob": Node(Collect_DOBAgent, next="dob_confirm"),
+    "dob_confirm": Node(Confirm_SpellbackAgent, next=confirmed(then="collect_insurance", otherwise="collect_dob")),
+    "collect_insurance": Node(Collect_InsuranceAgent, next="insurance_confirm"),
+    "insurance_confirm": Node(Confirm_SpellbackAgent, next=confirmed(then="stedi_send", otherwise="collect_insurance")),
+    "stedi_send": Node(Stedi_CheckAgent, next=Branch(
+        cases=[
+            ("needs_representative", "transfer_to_rep"),
+            (retry_insurance, "collect_insurance"),
+            ("retry_validation", "transfer_to_rep"),
+        ],
+        default="goodbye",
+    )),
+    "transfer_to_rep": Node(TransferToRepresentativeAgent),
+    "goodbye": Node(EndingAgent),
+})
+
+
+# How many caller turns each node's LLM sees, see utils/chat_context.py; DEFAULT_POLICY elsewhere
+CONTEXT_POLICIES = {
+    # Callers often read their ID off the card in pieces
+    "collect_insurance": ContextPolicy(max_turns=3),
 }
 
 
+# Checkpoints a dropped or transferred call can resume from (the date of birth is confirmed by
+# then), and where it picks up once the caller has given that date of birth again at RESUME_VERIFY_NODE.
+# Never straight into stedi_send: the insurance ID is spelled back and confirmed first.
+RESUME_NODES = {"collect_insurance": "collect_insurance", "stedi_send": "insurance_confirm"}
+RESUME_VERIFY_NODE = "collect_dob"
+# A caller whose last call got this far starts over
+FINISHED_NODES = ("goodbye",)
+
+
+def new_flow_runner(job_context: JobContext) -> FlowRunner:
+    """Per-call walker of the flow graph, building agents for this job"""
+    return FlowRunner(flow, lambda agent_cls: agent_cls(job_context))
+
+
+# Fixed text the agent speaks on every call, pre-synthesized into the TTS cache
+STATIC_PROMPTS = [
+    Collect_FirstNameAgent.question,
+    Collect_LastNameAgent.question,
+    Collect_DOBAgent.question,
+    Collect_InsuranceAgent.question,
+    HOLD_MESSAGE,
+    TRANSFER_MESSAGE,
+    GOODBYE_MESSAGE,
+    RESUME_MESSAGE,
+    RESTART_MESSAGE,
+    *(text for _, text in FILLER_SCHEDULE),
+]
+
+
+def prewarm(proc: JobProcess) -> None:
+    setup_logging()
+    prewarm_providers(proc)
+    get_payer_index()
+    loaded = get_tts_cache().load(STATIC_PROMPTS)
+    logger.info(f"Loaded {loaded}/{len(STATIC_PROMPTS)} cached prompts")
+
+
+async def log_fast_path_stats() -> None:
+    logger.info(f"Fast path hit rates: {fast_path_stats.snapshot()}")
+
+
+async def flush_latency_metrics() -> None:
+    await asyncio.to_thread(histograms.flush)
+
+
+async def resume_point(ctx: JobContext) -> Tuple[Optional[str], str, Dict]:
+    """
+    (caller key, node to start at, state to start with) for this call. A caller
+    whose last call was dropped or transferred after confirming their date of
+    birth is asked for it again first (see Collect_DOBAgent.verify_resume);
+    everyone else starts at the start of the flow.
+    """
+    store = get_checkpoint_store()
+    if not store.enabled:
+        return None, flow.start, {}
+    participant = await ctx.wait_for_participant()
+    caller = caller_key(participant.attributes.get("sip.phoneNumber") or participant.identity)
+    resumed = await asyncio.to_thread(store.resume_point, caller, RESUME_NODES, FINISHED_NODES)
+    if resumed is None or "date_of_birth" not in resumed[1]:
+        return caller, flow.start, {}
+    node, slots = resumed
+    logger.info("Resuming call", extra=fields(node=node))
+    state = {key: value for key, value in slots.items() if key != "date_of_birth"}
+    return caller, RESUME_VERIFY_NODE, {
+        **state, "resumed": True, "resume_dob": slots["date_of_birth"], "resume_to": RESUME_NODES[node]
+    }
 
 
 async def entrypoint(ctx: JobContext) -> None:
-    await ctx.connect()
-    session = AgentSession()
-    session.userdata = SurveyData()
-    session.state = {"current_node": "collect_fname"}
-    await session.start(agent=Collect_FirstNameAgent(ctx), room=ctx.room)
+    ctx.add_shutdown_callback(close_stedi_client)
+    ctx.add_shutdown_callback(log_fast_path_stats)
+    ctx.add_shutdown_callback(flush_latency_metrics)
+    ctx.add_shutdown_callback(flush_checkpoints)
+    # Open every provider connection and check Stedi while the room is joined, instead of
+    # one after another once the first node needs them
+    providers = get_provider_pool()
+    ctx.add_shutdown_callback(providers.aclose)
+    startup = Startup()
+    startup.start("stt", providers.warm_stt())
+    startup.start("llm", providers.warm_llm())
+    startup.start("tts", providers.warm_tts())
+    startup.start("stedi", verify_stedi())
+    room = startup.start("room", ctx.connect(), timeout=None)
+    session = AgentSession(min_endpointing_delay=MIN_ENDPOINTING_DELAY)
+    runner = new_flow_runner(ctx)
+    await room
+    # Synthesize any prompts not on disk yet in the background; the first call still works uncached
+    get_tts_cache().warm_in_background(providers.tts, STATIC_PROMPTS)
+    caller, start_node, state = await resume_point(ctx)
+    session.userdata = SurveyData(runner=runner, caller=caller)
+    session.state = {**state, "current_node": start_node}
+    attach_session_metrics(session)
+    attach_session_breakers(session)
+    await session.start(agent=runner.agent_for(start_node), room=ctx.room)
+
+async def batch_entrypoint(args: argparse.Namespace) -> None:
+    try:
+        stats = await run_batch(args.roster, args.output, eligibility_request, args.concurrency, args.rate)
+    finally:
+        await close_stedi_client()
+    print(f"{stats.total} rows: {stats.checked} checked, {stats.skipped} already done, "
+          f"{stats.failed} failed, {stats.invalid} invalid")
+
+
+def run_batch_cli(argv: List[str]) -> None:
+    """Pre-visit eligibility: python agent.py batch roster.csv results.jsonl"""
+    parser = argparse.ArgumentParser(prog="agent.py batch", description="Verify a roster of patients before they call")
+    parser.add_argument("roster", help="CSV or JSONL with first_name, last_name, insurance_id, date_of_birth (and optional id)")
+    parser.add_argument("output", help="JSONL results, appended to; rerun with the same file to resume")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=BATCH_RATE_PER_SECOND, help="Stedi requests per second")
+    args = parser.parse_args(argv)
+    setup_logging()
+    if not os.getenv("ELIGIBILITY_CACHE_DB"):
+        logger.warning("ELIGIBILITY_CACHE_DB is not set, callers won't see these results")
+    asyncio.run(batch_entrypoint(args))
+
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    if sys.argv[1:2] == ["batch"]:
+        run_batch_cli(sys.argv[2:])
+    else:
+        # Only a worker that takes calls needs this; download-files, console and --help
+        # must not bind the metrics port a running worker already holds
+        if sys.argv[1:2] in (["start"], ["dev"]):
+            start_metrics_server()
+        cli.run_app(WorkerOptions(
+            entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
+            request_fnc=request_job,
+            load_fnc=worker_load,
+            load_threshold=LOAD_THRESHOLD,
+        ))
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Concurrent calls per core before turn latency regresses.
+
+Runs N simulated calls at once, one process each like livekit's job
+executor, for increasing N. Every call pushes real-time 48kHz audio through
+its own Silero VAD stream and records how far the VAD's decisions lag behind
+the audio; that lag is added straight onto end-of-speech detection, and so to
+every turn. Capacity is the largest N whose p95 lag stays within --tolerance-ms
+of a single call's.
+
+    python benchmarks/bench_capacity.py --sessions 1,2,4,8,16,24,32 --seconds 10
+
+Only the VAD and the optional --pipeline-cpu busy work run, so the result is
+an upper bound; set WORKER_SESSIONS_PER_CORE (utils/admission.py) at or
+below it.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.utils.hw import get_cpu_monitor
+from livekit.agents.vad import VADEventType
+from livekit.plugins import silero
+
+from utils.admission import LOAD_THRESHOLD, measure_vad_cpu
+
+SAMPLE_RATE = 48000
+FRAME_SAMPLES = SAMPLE_RATE // 100
+
+
+async def run_call(seconds: float, pipeline_cpu: float, start_at: float) -> List[float]:
+    """One call: real-time audio into a VAD stream. Returns the lag of each VAD decision in seconds."""
+    vad = silero.VAD.load()
+    audio = np.random.default_rng(os.getpid()).normal(0, 2000, int(SAMPLE_RATE * seconds)).astype(np.int16)
+    stream = vad.stream()
+    lags: List[float] = []
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    started = time.perf_counter()
+
+    async def consume() -> None:
+        async for ev in stream:
+            if ev.type == VADEventType.INFERENCE_DONE:
+                lags.append(time.perf_counter() - started - ev.timestamp)
+
+    consumer = asyncio.create_task(consume())
+    for i, offset in enumerate(range(0, len(audio) - FRAME_SAMPLES + 1, FRAME_SAMPLES)):
+        # A 10ms frame can only be pushed once all of it has been "spoken"
+        await asyncio.sleep(max(0.0, started + (i + 1) * 0.01 - time.perf_counter()))
+        stream.push_frame(rtc.AudioFrame(audio[offset:offset + FRAME_SAMPLES].tobytes(), SAMPLE_RATE, 1, FRAME_SAMPLES))
+        if pipeline_cpu:
+            # Stand-in for the rest of the call's audio pipeline
+            busy_until = time.perf_counter() + pipeline_cpu * 0.01
+            while time.perf_counter() < busy_until:
+                pass
+    stream.end_input()
+    await consumer
+    return lags
+
+
+def call_process(seconds: float, pipeline_cpu: float, start_at: float, results: multiprocessing.Queue) -> None:
+    lags = asyncio.run(run_call(seconds, pipeline_cpu, start_at))
+    results.put((lags, time.process_time()))
+
+
+def run_level(sessions: int, seconds: float, pipeline_cpu: float) -> Tuple[np.ndarray, float]:
+    """Run `sessions` calls at once. Returns every VAD lag and the CPU they used in core-seconds."""
+    results: multiprocessing.Queue = multiprocessing.Queue()
+    # Give every process time to start and load the model before the audio starts
+    start_at = time.time() + 2.0 + 0.1 * sessions
+    procs = [
+        multiprocessing.Process(target=call_process, args=(seconds, pipeline_cpu, start_at, results))
+        for _ in range(sessions)
+    ]
+    for proc in procs:
+        proc.start()
+    lags: List[float] = []
+    cpu_seconds = 0.0
+    for _ in procs:
+        call_lags, call_cpu = results.get()
+        lags.extend(call_lags)
+        cpu_seconds += call_cpu
+    for proc in procs:
+        proc.join()
+    return np.array(lags) * 1000, cpu_seconds
+
+
+def main(args: argparse.Namespace) -> None:
+    cores = get_cpu_monitor().cpu_count()
+    vad_cpu = measure_vad_cpu()
+    print(f"cores={cores:g} vad_cpu_per_session={vad_cpu:.3f} pipeline_cpu={args.pipeline_cpu:g}")
+    print(f"{'sessions':>8} {'per core':>8} {'cpu':>6} {'vad load':>9} {'p50 lag':>9} {'p95 lag':>9} {'p99 lag':>9}")
+    baseline = None
+    capacity = 0
+    for sessions in (int(n) for n in args.sessions.split(",")):
+        lags, cpu_seconds = run_level(sessions, args.seconds, args.pipeline_cpu)
+        p50, p95, p99 = np.percentile(lags, [50, 95, 99])
+        if baseline is None:
+            baseline = p95
+        # CPU includes each process loading its model, so it reads a little high
+        cpu = cpu_seconds / (args.seconds * cores)
+        regressed = p95 > baseline + args.tolerance_ms
+        print(f"{sessions:>8} {sessions / cores:>8.1f} {cpu:>6.0%} {sessions * vad_cpu / cores:>9.2f} "
+              f"{p50:>7.1f}ms {p95:>7.1f}ms {p99:>7.1f}ms{'  regressed' if regressed else ''}")
+        if regressed:
+            break
+        capacity = sessions
+    per_core = capacity / cores
+    print(f"capacity: {capacity} concurrent calls ({per_core:.1f} per core) within {args.tolerance_ms:g}ms of baseline p95")
+    print(f"suggested: WORKER_SESSIONS_PER_CORE={per_core:.1f} with WORKER_LOAD_THRESHOLD={LOAD_THRESHOLD:g}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16,24,32", help="comma separated concurrency levels, ascending")
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio per call at each level")
+    parser.add_argument("--tolerance-ms", type=float, default=15.0, help="allowed p95 lag over the single-call baseline")
+    parser.add_argument("--pipeline-cpu", type=float, default=0.0,
+                        help="extra fraction of a core each call burns outside the VAD")
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""
+Prompt size per LLM turn with and without the per-node context policies.
+
+Walks a scripted call through every LLM node in agent.py, with --reasks
+unclear answers per node, and estimates the prompt each turn sends:
+
+  carried   the whole call's history, as when chat_ctx is passed on at handoff
+  node      the node agent's own untrimmed context
+  trimmed   what BaseAgent.llm_node sends: the node's instructions and its
+            last few turns (utils/chat_context.py)
+
+Tokens are estimated at 4 characters per token plus 4 per message; the
+per-node token counters on /metrics report the real numbers.
+
+    python benchmarks/bench_chat_context.py --reasks 0,2,5
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key in ("DEEPGRAM_API_KEY", "OPENAI_API_KEY", "ELEVEN_API_KEY"):
+    os.environ.setdefault(key, "bench")
+
+from livekit.agents.llm import ChatContext
+
+from benchmarks.flow_simulator import FakeProviderPool
+from utils.chat_context import DEFAULT_POLICY, trim_chat_ctx
+from utils.providers import set_provider_pool
+
+# (node, question, unclear answer, answer)
+CALL: List[Tuple[str, str, str, str]] = [
+    ("collect_fname", "What is your first name?", "uh hi, is this the clinic?", "it's Jane"),
+    ("fname_confirm", "I heard your first name as Jane, spelled J A N E. Is that correct?", "sorry what?", "yes that's it"),
+    ("collect_lname", "What is your last name?", "my last name, hold on", "Doe, D O E"),
+    ("lname_confirm", "I heard your last name as Doe, spelled D O E. Is that correct?", "hmm", "correct"),
+    ("collect_dob", "What is your date of birth? Please provide it in the format of month, day, year.",
+     "I was born in the spring", "April fourth two thousand four"),
+    ("dob_confirm", "I heard your date of birth as April fourth two thousand four. Is that correct?", "what was that", "yeah"),
+    ("collect_insurance", "What is your insurance id or number?", "let me find my card, it's in my bag somewhere",
+     "A E T N A one two three four five"),
+    ("insurance_confirm", "I heard your insurance ID as AETNA12345, spelled A E T N A 1 2 3 4 5. Is that correct?",
+     "one second", "yes"),
+]
+
+
+def estimated_tokens(chat_ctx: ChatContext) -> int:
+    messages = [item for item in chat_ctx.items if item.type == "message"]
+    return sum(len(m.text_content or "") for m in messages) // 4 + 4 * len(messages)
+
+
+def run_call(agent_module: Any, reasks: int) -> Dict[str, List[float]]:
+    totals: Dict[str, List[float]] = {"carried": [], "node": [], "trimmed": [], "trim_us": []}
+    carried = ChatContext.empty()
+    for node, question, unclear, answer in CALL:
+        instructions = agent_module.flow.nodes[node].agent(job_context=None).instructions
+        own = ChatContext.empty()
+        own.add_message(role="system", content=instructions)
+        carried.add_message(role="system", content=instructions)
+        for reply in [unclear] * reasks + [answer]:
+            for ctx in (own, carried):
+                ctx.add_message(role="assistant", content=question)
+                ctx.add_message(role="user", content=reply)
+            policy = agent_module.CONTEXT_POLICIES.get(node, DEFAULT_POLICY)
+            start = time.perf_counter()
+            trimmed = trim_chat_ctx(own, policy)
+            totals["trim_us"].append((time.perf_counter() - start) * 1e6)
+            totals["carried"].append(estimated_tokens(carried))
+            totals["node"].append(estimated_tokens(own))
+            totals["trimmed"].append(estimated_tokens(trimmed))
+    return totals
+
+
+def main(args: argparse.Namespace) -> None:
+    set_provider_pool(FakeProviderPool())
+    import agent as agent_module
+
+    print(f"{'reasks':>6} {'turns':>5} {'carried':>8} {'node':>6} {'trimmed':>8} {'max trimmed':>11} {'trim':>7}")
+    for reasks in (int(n) for n in args.reasks.split(",")):
+        totals = run_call(agent_module, reasks)
+        turns = len(totals["trimmed"])
+        mean = {k: sum(v) / len(v) for k, v in totals.items()}
+        print(f"{reasks:>6} {turns:>5} {mean['carried']:>8.0f} {mean['node']:>6.0f} {mean['trimmed']:>8.0f} "
+              f"{max(totals['trimmed']):>11} {mean['trim_us']:>5.0f}us")
+    print("tokens are estimated means per LLM turn")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reasks", default="0,2,5", help="comma separated unclear answers per node before the real one")
+    main(parser.parse_args())
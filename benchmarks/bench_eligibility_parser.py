@@ -0,0 +1,148 @@
+"""
+Cost of reading large Stedi eligibility responses.
+
+Pads the recorded fixtures in benchmarks/fixtures/stedi with hundreds of
+extra benefitsInformation entries, the way plans with detailed benefit
+tables come back, and times json.loads() + validate_insurance_eligibility()
+against the streaming parser in utils/eligibility_parser.py, fed the whole
+body at once and in network-sized chunks. "after last byte" is the parse work
+left once the final chunk arrives, which is what the caller actually waits on:
+all of it for json.loads(), only the last chunk for the streaming parser.
+
+    python benchmarks/bench_eligibility_parser.py --benefits 50,500,2000 --copay-at 0.5
+
+--copay-at places the office visit copay that fraction of the way through the
+padded benefits; the streaming parser stops decoding once it has seen it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_stedi import FIXTURE_DIR, load_fixtures
+from utils.eligibility_parser import EligibilityStreamParser, parse_eligibility
+from utils.validate_insuance import validate_eligibility, validate_insurance_eligibility
+
+# Service types that show up in detailed benefit tables: medical care, chiropractic, hospital,
+# emergency, urgent care, mental health, pharmacy, vision
+SERVICE_TYPES = ["1", "33", "35", "47", "48", "50", "86", "UC", "MH", "88", "AL", "A6"]
+BENEFIT_CODES = [("A", "Co-Insurance"), ("C", "Deductible"), ("G", "Out of Pocket (Stop Loss)"), ("B", "Co-Payment")]
+
+
+def filler_benefit(rng: random.Random) -> Dict[str, Any]:
+    code, name = rng.choice(BENEFIT_CODES)
+    network = rng.choice(["Y", "N", "W"])
+    benefit: Dict[str, Any] = {
+        "code": code,
+        "name": name,
+        "coverageLevelCode": rng.choice(["IND", "FAM"]),
+        "coverageLevel": rng.choice(["Individual", "Family"]),
+        "serviceTypeCodes": [rng.choice(SERVICE_TYPES)],
+        "serviceTypes": ["Health Benefit Plan Coverage"],
+        "timeQualifierCode": rng.choice(["23", "29", "27"]),
+        "inPlanNetworkIndicatorCode": network,
+        "inPlanNetworkIndicator": {"Y": "Yes", "N": "No", "W": "Not Applicable"}[network],
+        "benefitsDateInformation": {"plan": "20240101-20241231"},
+        "additionalInformation": [{"description": "Benefit detail " + str(rng.randint(1, 10**6))}],
+    }
+    if code == "A":
+        benefit["benefitPercent"] = rng.choice(["0.2", "0.3", "0.5"])
+    else:
+        benefit["benefitAmount"] = str(rng.choice([10, 25, 40, 500, 1500, 6000]))
+    return benefit
+
+
+def pad_fixture(body: bytes, benefits: int, copay_at: float, rng: random.Random) -> bytes:
+    """Fixture with `benefits` filler entries around its own, its office copay at the given fraction"""
+    data = json.loads(body)
+    own = data.get("benefitsInformation") or []
+    fillers = [filler_benefit(rng) for _ in range(benefits)]
+    split = int(len(fillers) * copay_at)
+    data["benefitsInformation"] = fillers[:split] + own + fillers[split:]
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+def per_call_us(fn: Callable[[], Any], rounds: int) -> float:
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start > 0.05:
+            break
+        number *= 2
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def streamed(body: bytes, chunk_size: int) -> Dict[str, Any]:
+    return validate_eligibility(parse_eligibility(body, chunk_size))
+
+
+def after_last_byte_us(body: bytes, chunk_size: int, rounds: int) -> float:
+    """Time for the final feed(), close() and validation, earlier chunks already parsed"""
+    chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)]
+    best = float("inf")
+    for _ in range(rounds * 20):
+        parser = EligibilityStreamParser()
+        for chunk in chunks[:-1]:
+            parser.feed(chunk)
+        start = time.perf_counter()
+        parser.feed(chunks[-1])
+        validate_eligibility(parser.close())
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main(args: argparse.Namespace) -> None:
+    fixtures = load_fixtures(args.fixture_dir)
+    names = [n for n in args.fixtures.split(",") if n] or list(fixtures)
+    sizes = [int(n) for n in args.benefits.split(",")]
+    print(f"{'fixture':<24} {'benefits':>8} {'KB':>6} {'decoded':>8} {'json.loads':>11} "
+          f"{'stream':>9} {'chunked':>9} {'after last byte':>16}")
+    mismatches: List[str] = []
+    for name in names:
+        for size in sizes:
+            rng = random.Random(args.seed)
+            body = pad_fixture(fixtures[name], size, args.copay_at, rng)
+            expected = validate_insurance_eligibility(json.loads(body))
+            for chunk_size in (0, args.chunk_size):
+                if streamed(body, chunk_size) != expected:
+                    mismatches.append(f"{name} benefits={size} chunk={chunk_size}")
+
+            parser = EligibilityStreamParser()
+            parser.feed(body)
+            parser.close()
+
+            legacy_us = per_call_us(lambda: validate_insurance_eligibility(json.loads(body)), args.rounds)
+            stream_us = per_call_us(lambda: streamed(body, 0), args.rounds)
+            chunked_us = per_call_us(lambda: streamed(body, args.chunk_size), args.rounds)
+            tail_us = after_last_byte_us(body, args.chunk_size, args.rounds)
+            print(f"{name:<24} {size:>8} {len(body) / 1024:>6.0f} {parser.elements_decoded:>8} {legacy_us:>9.0f}us "
+                  f"{stream_us:>7.0f}us {chunked_us:>7.0f}us {tail_us:>14.0f}us")
+    if mismatches:
+        print("different validation results: " + ", ".join(mismatches))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixture-dir", default=FIXTURE_DIR)
+    parser.add_argument("--fixtures", default="active_in_network,inactive,subscriber_errors",
+                        help="comma separated fixture names, empty for all")
+    parser.add_argument("--benefits", default="50,500,2000", help="comma separated filler benefit counts")
+    parser.add_argument("--copay-at", type=float, default=0.5)
+    parser.add_argument("--chunk-size", type=int, default=16384, help="bytes per feed() in the chunked run")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,109 @@
+"""
+Benchmark flow node handoff cost with and without the shared provider pool.
+
+Builds the same chain of agents a full call walks through (9 nodes) and times
+how long each handoff spends constructing the agent and its providers. The
+"compiled" row walks a FlowGraph whose runner builds the next agent while the
+current node is active, so the timed part is only the edge lookup.
+
+    python benchmarks/bench_handoff.py --calls 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Provider constructors only validate that a key exists, no network is used.
+for key in ("DEEPGRAM_API_KEY", "OPENAI_API_KEY", "ELEVEN_API_KEY"):
+    os.environ.setdefault(key, "bench")
+
+from livekit.agents.voice import Agent
+from livekit.plugins import deepgram, openai, elevenlabs, silero
+
+from utils.flow_graph import FlowGraph, FlowRunner, Node
+from utils.providers import ProviderPool, LLM_MODEL, LLM_TIMEOUT, TTS_VOICE_ID, TTS_MODEL
+
+NODES_PER_CALL = 9
+
+
+def legacy_agent() -> Agent:
+    """Mirrors the old BaseAgent.__init__ which rebuilt every provider."""
+    return Agent(
+        instructions="bench",
+        stt=deepgram.STT(),
+        llm=openai.LLM(model=LLM_MODEL, timeout=LLM_TIMEOUT),
+        tts=elevenlabs.TTS(voice_id=TTS_VOICE_ID, model=TTS_MODEL),
+        vad=silero.VAD.load(),
+    )
+
+
+def pooled_agent(pool: ProviderPool) -> Agent:
+    return Agent(
+        instructions="bench",
+        stt=pool.stt,
+        llm=pool.llm,
+        tts=pool.tts,
+        vad=pool.vad,
+    )
+
+
+def run(label: str, make_agent, calls: int) -> None:
+    samples = []
+    for _ in range(calls):
+        for _ in range(NODES_PER_CALL):
+            start = time.perf_counter()
+            make_agent()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<8} handoffs={len(samples):<5} "
+          f"mean={statistics.mean(samples):8.3f}ms "
+          f"p50={statistics.median(samples):8.3f}ms "
+          f"p95={p95:8.3f}ms "
+          f"per_call={statistics.mean(samples) * NODES_PER_CALL:8.3f}ms")
+
+
+async def run_compiled(pool: ProviderPool, calls: int) -> None:
+    names = [f"node_{i}" for i in range(NODES_PER_CALL)]
+    graph = FlowGraph(start=names[0], nodes={
+        name: Node(Agent, next=names[i + 1] if i + 1 < len(names) else None) for i, name in enumerate(names)
+    })
+    samples = []
+    for _ in range(calls):
+        runner = FlowRunner(graph, lambda agent_cls: pooled_agent(pool))
+        runner.agent_for(graph.start)
+        for current in names[:-1]:
+            # Let the runner prepare the successor, as it does while a prompt plays
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            await runner.next_agent(current, {})
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{'compiled':<8} handoffs={len(samples):<5} "
+          f"mean={statistics.mean(samples):8.3f}ms "
+          f"p50={statistics.median(samples):8.3f}ms "
+          f"p95={p95:8.3f}ms "
+          f"per_call={statistics.mean(samples) * NODES_PER_CALL:8.3f}ms")
+
+
+async def main(calls: int) -> None:
+    run("legacy", legacy_agent, calls)
+
+    start = time.perf_counter()
+    pool = ProviderPool(vad_model=silero.VAD.load())
+    print(f"prewarm  {(time.perf_counter() - start) * 1000:.3f}ms (once per worker)")
+    run("pooled", lambda: pooled_agent(pool), calls)
+    await run_compiled(pool, calls)
+    await pool.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=10, help="simulated calls per variant")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
@@ -0,0 +1,104 @@
+"""
+Accuracy and per-call cost of the spoken-entity normalizers.
+
+Runs the corpus in benchmarks/fixtures/spoken_entities.json through
+utils/normalize.py and through the code it replaced: dateutil for dates of
+birth, the word-by-word digit mapping from spell_out for insurance IDs and
+str.capitalize for names.
+
+    python benchmarks/bench_normalize.py --iterations 2000
+
+Cached numbers are repeat calls served by the lru_cache; cold numbers clear it first.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dateutil.parser
+
+from utils.normalize import NORMALIZERS
+
+CORPUS_FILE = Path(__file__).parent / "fixtures" / "spoken_entities.json"
+LEGACY_DIGITS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+    "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+}
+
+
+def legacy_date(value: str) -> Optional[str]:
+    try:
+        return dateutil.parser.parse(value).strftime("%Y%m%d")
+    except (ValueError, OverflowError):
+        return None
+
+
+def legacy_member_id(value: str) -> str:
+    return "".join(LEGACY_DIGITS.get(word, word) for word in value.lower().split()).upper()
+
+
+def legacy_name(value: str) -> str:
+    return value.lower().capitalize()
+
+
+LEGACY: Dict[str, Callable[[str], Optional[str]]] = {
+    "date_of_birth": legacy_date,
+    "insurance_id": legacy_member_id,
+    "first_name": legacy_name,
+    "last_name": legacy_name,
+}
+
+
+def per_call_us(fn: Callable[[str], Any], values: List[str], iterations: int, clear: Optional[Callable[[], None]] = None) -> float:
+    samples = []
+    for _ in range(iterations):
+        if clear is not None:
+            clear()
+        start = time.perf_counter()
+        for value in values:
+            fn(value)
+        samples.append((time.perf_counter() - start) / len(values) * 1e6)
+    return statistics.median(samples)
+
+
+def main(args: argparse.Namespace) -> None:
+    corpus = json.loads(Path(args.corpus).read_text())
+    kinds = sorted({entry["kind"] for entry in corpus})
+
+    print(f"{'kind':<14} {'n':>3}  {'legacy acc':>10} {'new acc':>8}  {'legacy us':>9} {'cold us':>8} {'cached us':>9}")
+    misses = []
+    for kind in kinds:
+        entries = [e for e in corpus if e["kind"] == kind]
+        values = [e["spoken"] for e in entries]
+        normalizer, legacy = NORMALIZERS[kind], LEGACY[kind]
+        new_ok = legacy_ok = 0
+        for entry in entries:
+            got = normalizer(entry["spoken"])
+            new_ok += got == entry["expected"]
+            legacy_ok += legacy(entry["spoken"]) == entry["expected"]
+            if got != entry["expected"]:
+                misses.append((kind, entry["spoken"], entry["expected"], got))
+
+        legacy_us = per_call_us(legacy, values, args.iterations)
+        cold_us = per_call_us(normalizer, values, args.iterations, clear=normalizer.cache_clear)
+        cached_us = per_call_us(normalizer, values, args.iterations)
+        print(f"{kind:<14} {len(entries):>3}  {legacy_ok / len(entries):>10.0%} {new_ok / len(entries):>8.0%}  "
+              f"{legacy_us:>9.2f} {cold_us:>8.2f} {cached_us:>9.2f}")
+
+    if misses:
+        print("\nnormalizer misses")
+        for kind, spoken, expected, got in misses:
+            print(f"  {kind:<14} {spoken!r:<50} expected={expected!r} got={got!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", default=str(CORPUS_FILE), help="JSON list of {kind, spoken, expected}")
+    parser.add_argument("--iterations", type=int, default=500)
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Lookup throughput of the payer routing index.
+
+Generates member IDs from the shapes in utils/payers.json (plus spoken payer
+names and unroutable IDs) and times PayerIndex.candidates() against a linear
+scan that tries every payer's regexes in turn.
+
+    python benchmarks/bench_payer_index.py --ids 20000 --payers 200
+
+--payers pads the table with synthetic payers to show how each approach
+scales with table size.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.payer_index import PAYER_INDEX_FILE, PayerIndex, compact_id
+
+
+def synthetic_payers(count: int, rng: random.Random) -> List[Dict]:
+    payers = []
+    for i in range(count):
+        prefix = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 4)))
+        payers.append({
+            "name": f"Synthetic Payer {i}",
+            "trading_partner_id": f"S{i:05d}",
+            "aliases": [f"synthetic payer {i}"],
+            "member_ids": [{"prefix": prefix, "shape": rf"\d{{{rng.randint(6, 10)}}}"}],
+        })
+    return payers
+
+
+def sample_ids(payers: List[Dict], count: int, rng: random.Random) -> List[str]:
+    ids = []
+    for _ in range(count):
+        payer = rng.choice(payers)
+        roll = rng.random()
+        if roll < 0.1:
+            ids.append("".join(rng.choices(string.ascii_uppercase + string.digits, k=rng.randint(4, 12))))
+        elif roll < 0.3 and payer.get("aliases"):
+            ids.append(f"{rng.choice(payer['aliases'])} {rng.randint(10000, 99999)}")
+        else:
+            member_id = rng.choice(payer["member_ids"])
+            digits = int(re.search(r"\d+", member_id["shape"]).group())
+            ids.append(member_id["prefix"] + "".join(rng.choices(string.digits, k=digits)))
+    return ids
+
+
+class LinearScan:
+    """Baseline: try every payer's name and ID regex in table order"""
+    def __init__(self, payers: List[Dict]) -> None:
+        self.rules = []
+        for payer in payers:
+            for alias in payer.get("aliases", []):
+                self.rules.append((payer["trading_partner_id"], re.compile(re.escape(compact_id(alias)) + "[A-Z0-9]*")))
+            for member_id in payer["member_ids"]:
+                self.rules.append((payer["trading_partner_id"], re.compile(re.escape(member_id["prefix"]) + member_id["shape"])))
+
+    def candidates(self, member_id: str) -> List[str]:
+        key = compact_id(member_id)
+        return list(dict.fromkeys(partner for partner, rule in self.rules if rule.fullmatch(key)))
+
+
+def lookups_per_second(fn, ids: List[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for member_id in ids:
+            fn(member_id)
+        best = min(best, time.perf_counter() - start)
+    return len(ids) / best
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    with open(args.payer_file, "r", encoding="utf-8") as f:
+        payers = json.load(f)
+    payers += synthetic_payers(max(0, args.payers - len(payers)), rng)
+    ids = sample_ids(payers, args.ids, rng)
+
+    build_start = time.perf_counter()
+    index = PayerIndex(payers)
+    build_ms = (time.perf_counter() - build_start) * 1000
+    scan = LinearScan(payers)
+
+    mismatches = sum(set(index.candidates(m)) != set(scan.candidates(m)) for m in ids)
+    trie_rate = lookups_per_second(index.candidates, ids, args.rounds)
+    scan_rate = lookups_per_second(scan.candidates, ids, args.rounds)
+    routed = sum(bool(index.candidates(m)) for m in ids)
+
+    print(f"payers={len(payers)} ids={len(ids)} routed={routed / len(ids):.0%} build={build_ms:.1f}ms")
+    print(f"  trie index   {trie_rate:>12,.0f} lookups/s  {1e6 / trie_rate:6.2f}us/lookup")
+    print(f"  linear scan  {scan_rate:>12,.0f} lookups/s  {1e6 / scan_rate:6.2f}us/lookup")
+    if mismatches:
+        print(f"  {mismatches} id(s) got different candidates from the two approaches")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payer-file", default=PAYER_INDEX_FILE)
+    parser.add_argument("--ids", type=int, default=20000)
+    parser.add_argument("--payers", type=int, default=0, help="pad the table with synthetic payers up to this many")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
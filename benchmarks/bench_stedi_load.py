@@ -0,0 +1,86 @@
+"""
+Concurrent load benchmark for check_insurance_eligibility.
+
+Starts the local Stedi stand-in in-process (or uses --url) and drives
+thousands of eligibility checks through the pooled client, reporting
+throughput, error counts and p50/p95/p99 latency.
+
+    python benchmarks/bench_stedi_load.py --requests 5000 --concurrency 200 \\
+        --latency lognormal:0.3,0.4 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_stedi import add_config_args, config_from_args, start_server
+from utils.validate_insuance import StediHTTPClient, check_insurance_eligibility
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+async def run(args: argparse.Namespace) -> None:
+    runner = None
+    url = args.url
+    if url is None:
+        runner, url = await start_server(config_from_args(args))
+    os.environ["STEDI_API_URL"] = url
+    os.environ.setdefault("STEDI_API_KEY", "bench")
+    # Injected upstream errors are counted below, don't log each one
+    logging.getLogger("utils.validate_insuance").setLevel(logging.CRITICAL)
+
+    client = StediHTTPClient(limit=args.limit, limit_per_host=args.limit_per_host)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            result = await check_insurance_eligibility(
+                first_name="Jane",
+                last_name="Doe",
+                insurance_id=f"AETNA{i:08d}",
+                date_of_birth="20040404",
+                session=client.session,
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            outcomes["ok" if result["success"] else result.get("error_type", "error")] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    await client.aclose()
+    if runner is not None:
+        await runner.cleanup()
+
+    latencies.sort()
+    print(f"requests={args.requests} concurrency={args.concurrency} "
+          f"limit_per_host={args.limit_per_host} elapsed={elapsed:.2f}s")
+    print(f"throughput={args.requests / elapsed:.1f} req/s")
+    print(f"latency p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms "
+          f"p99={percentile(latencies, 99):.1f}ms max={latencies[-1]:.1f}ms")
+    print("outcomes " + " ".join(f"{k}={v}" for k, v in sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100, help="checks in flight at once")
+    parser.add_argument("--limit", type=int, default=100, help="client total connection limit")
+    parser.add_argument("--limit-per-host", type=int, default=20, help="client per-host connection limit")
+    parser.add_argument("--url", default=None, help="eligibility URL of an already running server")
+    add_config_args(parser)
+    asyncio.run(run(parser.parse_args()))
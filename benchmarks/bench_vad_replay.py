@@ -0,0 +1,259 @@
+"""
+Replay caller utterances through the VAD and endpointing path offline.
+
+Each utterance in benchmarks/fixtures/audio/utterances.json lists where the
+caller is actually speaking. Its audio comes from <name>.wav next to the
+manifest (a real recording, 16-bit PCM, any sample rate) or, when there is
+no recording, from a synthesized voiced stand-in with the same timing.
+
+The audio goes through a Silero VAD stream with each parameter combination.
+The turn is committed the way AgentSession does it: min_endpointing_delay after
+end-of-speech, unless speech resumes first, and not before a stub STT has
+produced the final transcript. Reported per combination:
+
+  eos delay        end-of-speech event after the caller actually stopped
+  turn delay       turn committed after the caller stopped (first response
+                   with cached prompts, add LLM/TTS time otherwise)
+  false cutoffs    turns committed while the caller was still mid-utterance
+  cpu/audio s      VAD CPU time per second of audio
+
+    python benchmarks/bench_vad_replay.py --min-silence 0.3,0.55,0.8 --endpointing-delay 0.3,0.5
+
+Apply the chosen values with VAD_MIN_SILENCE_DURATION, VAD_ACTIVATION_THRESHOLD
+and MIN_ENDPOINTING_DELAY (utils/providers.py).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+import wave
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from livekit import rtc
+from livekit.agents.vad import VADEventType
+from livekit.plugins import silero
+
+from utils.providers import MIN_ENDPOINTING_DELAY, VAD_OPTIONS
+
+AUDIO_DIR = Path(__file__).parent / "fixtures" / "audio"
+SYNTH_RATE = 16000
+# Rough formants (F1, F2, F3) of a few vowels
+VOWELS = [(730, 1090, 2440), (270, 2290, 3010), (300, 870, 2240), (530, 1840, 2480), (570, 840, 2410)]
+
+
+@dataclass
+class Utterance:
+    name: str
+    slot: str
+    transcript: str
+    segments: List[Tuple[float, float]]
+    duration: float
+    audio: np.ndarray = field(repr=False, default=None)
+    sample_rate: int = SYNTH_RATE
+    recorded: bool = False
+
+    @property
+    def end_of_speech(self) -> float:
+        return self.segments[-1][1]
+
+
+def voiced(seconds: float, rng: np.random.Generator, f0: float) -> np.ndarray:
+    """Speech-like signal: a harmonic source with drifting pitch, shaped into a new vowel every syllable"""
+    n = int(seconds * SYNTH_RATE)
+    t = np.arange(n) / SYNTH_RATE
+    pitch = f0 * (1 + 0.06 * np.sin(2 * np.pi * 0.8 * t + rng.uniform(0, 2 * np.pi)))
+    phase = 2 * np.pi * np.cumsum(pitch) / SYNTH_RATE
+    source = sum(np.sin(k * phase) / k for k in range(1, 25))
+    out = np.zeros(n)
+    start = 0
+    while start < n:
+        size = min(n - start, int(rng.uniform(0.14, 0.28) * SYNTH_RATE))
+        freqs = np.fft.rfftfreq(size, 1 / SYNTH_RATE)
+        envelope = sum(1 / (1 + ((freqs - formant) / 90.0) ** 2) for formant in VOWELS[rng.integers(len(VOWELS))])
+        syllable = np.fft.irfft(np.fft.rfft(source[start:start + size]) * envelope, size)
+        out[start:start + size] = syllable * np.hanning(size) ** 0.5
+        start += size
+    return out / (np.max(np.abs(out)) or 1.0)
+
+
+def synthesize(utterance: Utterance, noise_db: float) -> np.ndarray:
+    rng = np.random.default_rng(sum(map(ord, utterance.name)))
+    audio = rng.normal(0, 10 ** (noise_db / 20), int(utterance.duration * SYNTH_RATE))
+    f0 = rng.uniform(100, 220)
+    for start, end in utterance.segments:
+        i = int(start * SYNTH_RATE)
+        speech = voiced(end - start, rng, f0) * rng.uniform(0.3, 0.6)
+        audio[i:i + len(speech)] += speech
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def read_wav(path: Path) -> Tuple[np.ndarray, int]:
+    with wave.open(str(path), "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        audio = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        if f.getnchannels() > 1:
+            audio = audio.reshape(-1, f.getnchannels()).mean(axis=1).astype(np.int16)
+        return audio, f.getframerate()
+
+
+def write_wav(path: Path, audio: np.ndarray, sample_rate: int) -> None:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(audio.tobytes())
+
+
+def load_utterances(audio_dir: Path, noise_db: float) -> List[Utterance]:
+    with open(audio_dir / "utterances.json", "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    utterances = []
+    for entry in entries:
+        utterance = Utterance(**{**entry, "segments": [tuple(s) for s in entry["segments"]]})
+        recording = audio_dir / f"{utterance.name}.wav"
+        if recording.exists():
+            utterance.audio, utterance.sample_rate = read_wav(recording)
+            utterance.recorded = True
+        else:
+            utterance.audio = synthesize(utterance, noise_db)
+        utterances.append(utterance)
+    return utterances
+
+
+class StubSTT:
+    """Stands in for Deepgram: the manifest transcript, final `final_delay` seconds after end-of-speech"""
+    def __init__(self, final_delay: float) -> None:
+        self.final_delay = final_delay
+
+    def final(self, utterance: Utterance, end_of_speech: float) -> Tuple[str, float]:
+        return utterance.transcript, end_of_speech + self.final_delay
+
+
+async def vad_events(vad: silero.VAD, utterance: Utterance) -> List[Tuple[VADEventType, float]]:
+    """(event type, audio time) for every start/end of speech in the utterance"""
+    frame_samples = utterance.sample_rate // 100
+    stream = vad.stream()
+    audio = utterance.audio
+    for start in range(0, len(audio) - frame_samples + 1, frame_samples):
+        stream.push_frame(rtc.AudioFrame(audio[start:start + frame_samples].tobytes(), utterance.sample_rate, 1, frame_samples))
+    stream.end_input()
+    events = []
+    async for ev in stream:
+        if ev.type != VADEventType.INFERENCE_DONE:
+            events.append((ev.type, ev.timestamp))
+    return events
+
+
+def commit_turn(
+    events: List[Tuple[VADEventType, float]],
+    utterance: Utterance,
+    endpointing_delay: float,
+    stt: StubSTT
+) -> Optional[Tuple[float, float]]:
+    """(end-of-speech time, commit time) of the first turn the session would commit, None if it never does"""
+    for i, (kind, at) in enumerate(events):
+        if kind != VADEventType.END_OF_SPEECH:
+            continue
+        resumed = any(
+            k == VADEventType.START_OF_SPEECH and at < t <= at + endpointing_delay for k, t in events[i + 1:]
+        )
+        if not resumed:
+            _, final_at = stt.final(utterance, at)
+            return at, max(at + endpointing_delay, final_at)
+    return None
+
+
+def run_config(
+    utterances: List[Utterance],
+    params: Dict[str, float],
+    endpointing_delay: float,
+    stt: StubSTT
+) -> Dict[str, object]:
+    vad = silero.VAD.load(**params)
+    eos_delays: List[float] = []
+    turn_delays: List[float] = []
+    cutoffs: List[str] = []
+    missed: List[str] = []
+    cpu_started = time.process_time()
+    for utterance in utterances:
+        events = asyncio.run(vad_events(vad, utterance))
+        turn = commit_turn(events, utterance, endpointing_delay, stt)
+        if turn is None:
+            missed.append(utterance.name)
+        elif turn[1] < utterance.end_of_speech:
+            cutoffs.append(utterance.name)
+        else:
+            eos_delays.append(turn[0] - utterance.end_of_speech)
+            turn_delays.append(turn[1] - utterance.end_of_speech)
+    cpu = time.process_time() - cpu_started
+    return {
+        "eos": np.array(eos_delays) * 1000,
+        "turn": np.array(turn_delays) * 1000,
+        "cutoffs": cutoffs,
+        "missed": missed,
+        "cpu_per_audio_second": cpu / sum(u.duration for u in utterances),
+    }
+
+
+def floats(spec: str) -> List[float]:
+    return [float(v) for v in spec.split(",")]
+
+
+def main(args: argparse.Namespace) -> None:
+    utterances = load_utterances(Path(args.audio_dir), args.noise_db)
+    recorded = sum(u.recorded for u in utterances)
+    print(f"{len(utterances)} utterances ({recorded} recorded, {len(utterances) - recorded} synthesized), "
+          f"stt final delay {args.stt_final_delay * 1000:.0f}ms")
+    if args.write_wavs:
+        os.makedirs(args.write_wavs, exist_ok=True)
+        for u in utterances:
+            write_wav(Path(args.write_wavs) / f"{u.name}.wav", u.audio, u.sample_rate)
+
+    stt = StubSTT(args.stt_final_delay)
+    header = (f"{'threshold':>9} {'silence':>7} {'endpoint':>8} {'eos p50':>8} {'eos p95':>8} "
+              f"{'turn p50':>8} {'turn p95':>8} {'cutoffs':>7} {'missed':>6} {'cpu/audio s':>11}")
+    print(header)
+    results = []
+    sweep = itertools.product(floats(args.activation_threshold), floats(args.min_silence), floats(args.endpointing_delay))
+    for threshold, silence, delay in sweep:
+        params = {**VAD_OPTIONS, "activation_threshold": threshold, "min_silence_duration": silence}
+        result = run_config(utterances, params, delay, stt)
+        results.append(((threshold, silence, delay), result))
+        eos, turn = result["eos"], result["turn"]
+        eos_p50, eos_p95 = np.percentile(eos, [50, 95]) if len(eos) else (float("nan"),) * 2
+        turn_p50, turn_p95 = np.percentile(turn, [50, 95]) if len(turn) else (float("nan"),) * 2
+        print(f"{threshold:>9g} {silence:>7g} {delay:>8g} {eos_p50:>6.0f}ms {eos_p95:>6.0f}ms "
+              f"{turn_p50:>6.0f}ms {turn_p95:>6.0f}ms {len(result['cutoffs']):>7} {len(result['missed']):>6} "
+              f"{result['cpu_per_audio_second']:>10.3f}s")
+        if args.verbose and (result["cutoffs"] or result["missed"]):
+            print(f"          cut off: {', '.join(result['cutoffs']) or '-'}  missed: {', '.join(result['missed']) or '-'}")
+
+    clean = [(config, r) for config, r in results if not r["cutoffs"] and not r["missed"] and len(r["turn"])]
+    if clean:
+        (threshold, silence, delay), best = min(clean, key=lambda item: np.percentile(item[1]["turn"], 95))
+        print(f"fastest without cutoffs: VAD_ACTIVATION_THRESHOLD={threshold:g} VAD_MIN_SILENCE_DURATION={silence:g} "
+              f"MIN_ENDPOINTING_DELAY={delay:g} (turn p95 {np.percentile(best['turn'], 95):.0f}ms)")
+    else:
+        print("every combination cut off or missed at least one utterance")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--audio-dir", default=AUDIO_DIR, help="directory with utterances.json and optional <name>.wav recordings")
+    parser.add_argument("--activation-threshold", default=str(VAD_OPTIONS["activation_threshold"]))
+    parser.add_argument("--min-silence", default="0.3,0.4,0.55,0.8", help="VAD min_silence_duration values")
+    parser.add_argument("--endpointing-delay", default=f"0.2,0.3,{MIN_ENDPOINTING_DELAY:g}", help="AgentSession min_endpointing_delay values")
+    parser.add_argument("--stt-final-delay", type=float, default=0.15, help="stub STT: final transcript after end-of-speech")
+    parser.add_argument("--noise-db", type=float, default=-50.0, help="background noise level of synthesized audio, dBFS")
+    parser.add_argument("--write-wavs", default=None, help="also write the audio used to this directory")
+    parser.add_argument("--verbose", action="store_true", help="name the utterances that were cut off or missed")
+    main(parser.parse_args())
@@ -0,0 +1,262 @@
+"""
+Offline text-mode simulator for the declarative flow in agent.py.
+
+Runs scripted caller turns through the real agent classes and
+BaseAgent.transition() with no STT/LLM/TTS: providers are None, the
+session and JobContext are stubs, and Stedi is the local mock from
+benchmarks/mock_stedi.py. Each caller turn first goes through the agent's
+deterministic fast path; turns it rejects are routed straight to the tool
+the LLM would call (collect(value) or confirm(is_correct)).
+
+    python benchmarks/flow_simulator.py --sessions 500 --concurrency 50
+    python benchmarks/flow_simulator.py --check   # exit 1 if a scenario ends on the wrong node
+
+Reports per-node latency, transition counts and end states.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep simulated Stedi failures and latencies out of the breaker state real workers on this host share
+os.environ.setdefault("RESILIENCE_DIR", tempfile.mkdtemp(prefix="flow_simulator_resilience_"))
+
+from benchmarks.mock_stedi import add_config_args, config_from_args, start_server
+from utils.fast_path import fast_path_stats
+from utils.providers import ProviderPool, set_provider_pool
+
+SCENARIO_FILE = Path(__file__).parent / "fixtures" / "scenarios.json"
+YES_WORDS = {"yes", "yeah", "yep", "correct", "right", "that's right", "that is correct"}
+
+
+class FakeProviderPool(ProviderPool):
+    """Agents get no STT/LLM/TTS/VAD; the simulator drives their tools directly."""
+
+    @property
+    def vad(self) -> None:
+        return None
+
+    @property
+    def stt(self) -> None:
+        return None
+
+    @property
+    def llm(self) -> None:
+        return None
+
+    @property
+    def tts(self) -> None:
+        return None
+
+
+class FakeSpeechHandle:
+    """Awaitable stand-in for SpeechHandle that 'plays' for a fixed time."""
+
+    def __init__(self, duration: float) -> None:
+        self._done = asyncio.Event()
+        self._timer = asyncio.get_running_loop().call_later(duration, self._done.set)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def interrupt(self) -> "FakeSpeechHandle":
+        self._timer.cancel()
+        self._done.set()
+        return self
+
+    def __await__(self):
+        async def _wait() -> "FakeSpeechHandle":
+            await self._done.wait()
+            return self
+        return _wait().__await__()
+
+
+class FakeSession:
+    """The parts of AgentSession the agents use: state, userdata, say(), update_agent() and aclose()."""
+
+    def __init__(self, seconds_per_word: float) -> None:
+        self.state: Dict[str, Any] = {}
+        self.userdata: Any = None
+        self.transcript: List[str] = []
+        self.closed = False
+        self.handoff: Any = None
+        self._seconds_per_word = seconds_per_word
+
+    def say(self, text: str, **kwargs: Any) -> FakeSpeechHandle:
+        self.transcript.append(text)
+        return FakeSpeechHandle(len(text.split()) * self._seconds_per_word)
+
+    def update_agent(self, agent: Any) -> None:
+        self.handoff = agent
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+def fake_job_context() -> Any:
+    async def delete_room(request: Any) -> None:
+        return None
+
+    return SimpleNamespace(
+        room=SimpleNamespace(name="simulated-room"),
+        api=SimpleNamespace(room=SimpleNamespace(delete_room=delete_room)),
+    )
+
+
+def attach(agent: Any, session: FakeSession) -> Any:
+    # Agent.session resolves through the running activity; point it at the fake session
+    agent._activity = SimpleNamespace(session=session)
+    return agent
+
+
+@dataclass
+class SessionResult:
+    scenario: str
+    end_node: str
+    outcome: str
+    node_ms: List[Tuple[str, float]] = field(default_factory=list)
+    transitions: List[Tuple[str, str]] = field(default_factory=list)
+    total_ms: float = 0.0
+
+
+async def run_session(flow_module: Any, scenario: Dict[str, Any], seconds_per_word: float) -> SessionResult:
+    session = FakeSession(seconds_per_word)
+    runner = flow_module.new_flow_runner(fake_job_context())
+    start = flow_module.flow.start
+    session.userdata = flow_module.SurveyData(runner=runner)
+    session.state = {"current_node": start}
+    result = SessionResult(scenario=scenario["name"], end_node=start, outcome="out_of_turns")
+    turns = list(scenario["turns"])
+    started = time.perf_counter()
+
+    agent = attach(runner.agent_for(start), session)
+    node, node_started = start, started
+    try:
+        while True:
+            node = session.state["current_node"]
+            node_started = time.perf_counter()
+            await agent.on_enter()
+            if session.closed:
+                result.node_ms.append((node, (time.perf_counter() - node_started) * 1000))
+                result.outcome = "closed"
+                break
+            if session.handoff is not None:
+                # on_enter handed off by itself (e.g. after the Stedi check), no caller turn needed
+                result.node_ms.append((node, (time.perf_counter() - node_started) * 1000))
+                result.transitions.append((node, session.state["current_node"]))
+                agent, session.handoff = attach(session.handoff, session), None
+                continue
+            if not turns:
+                result.node_ms.append((node, (time.perf_counter() - node_started) * 1000))
+                break
+            turn = turns.pop(0)
+            call = agent.fast_path(turn)
+            if call is not None:
+                next_agent = await call()
+            elif hasattr(agent, "collect"):
+                next_agent = await agent.collect(turn)
+            elif hasattr(agent, "confirm"):
+                next_agent = await agent.confirm(turn.strip().lower() in YES_WORDS)
+            else:
+                result.outcome = "no_tool"
+                break
+            result.node_ms.append((node, (time.perf_counter() - node_started) * 1000))
+            if next_agent is None:
+                result.outcome = "flow_end"
+                break
+            result.transitions.append((node, session.state["current_node"]))
+            agent = attach(next_agent, session)
+    except Exception as e:
+        result.node_ms.append((node, (time.perf_counter() - node_started) * 1000))
+        result.outcome = f"error:{type(e).__name__}"
+
+    result.end_node = session.state.get("current_node", "")
+    result.total_ms = (time.perf_counter() - started) * 1000
+    return result
+
+
+def report(results: List[SessionResult]) -> None:
+    per_node: Dict[str, List[float]] = defaultdict(list)
+    transitions: Counter = Counter()
+    end_states: Counter = Counter()
+    for r in results:
+        for node, ms in r.node_ms:
+            per_node[node].append(ms)
+        transitions.update(r.transitions)
+        end_states[(r.scenario, r.end_node, r.outcome)] += 1
+
+    print(f"\nsessions={len(results)} mean_session={statistics.mean(r.total_ms for r in results):.1f}ms")
+    print("\nper-node latency (on_enter + tool call)")
+    for node, samples in sorted(per_node.items()):
+        samples.sort()
+        p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+        print(f"  {node:<20} n={len(samples):<6} p50={statistics.median(samples):8.2f}ms "
+              f"p95={p95:8.2f}ms max={samples[-1]:8.2f}ms")
+    print("\ntransitions")
+    for (src, dst), count in sorted(transitions.items()):
+        print(f"  {src:<20} -> {dst:<20} {count}")
+    print("\nend states")
+    for (scenario, node, outcome), count in sorted(end_states.items()):
+        print(f"  {scenario:<26} {node:<20} {outcome:<24} {count}")
+    print("\nfast path (LLM skipped)")
+    for kind, stats in fast_path_stats.snapshot().items():
+        print(f"  {kind:<20} hits={stats['hits']:<6} misses={stats['misses']:<6} hit_rate={stats['hit_rate']:.0%}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    for key in ("DEEPGRAM_API_KEY", "OPENAI_API_KEY", "ELEVEN_API_KEY"):
+        os.environ.setdefault(key, "simulated")
+    os.environ["STEDI_API_KEY"] = "simulated"
+    logging.basicConfig(level=logging.WARNING)
+
+    runner, url = await start_server(config_from_args(args))
+    os.environ["STEDI_API_URL"] = url
+    set_provider_pool(FakeProviderPool())
+
+    import agent as flow_module
+
+    scenarios = json.loads(Path(args.scenarios).read_text())
+    rng = random.Random(args.seed)
+    picks = [scenarios[i % len(scenarios)] for i in range(args.sessions)]
+    rng.shuffle(picks)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(scenario: Dict[str, Any]) -> SessionResult:
+        async with semaphore:
+            return await run_session(flow_module, scenario, args.seconds_per_word)
+
+    results = await asyncio.gather(*(bounded(s) for s in picks))
+    await runner.cleanup()
+    report(results)
+
+    failures = [r for r in results if r.end_node != next(s for s in scenarios if s["name"] == r.scenario).get("expect_node", r.end_node)]
+    if failures:
+        print(f"\n{len(failures)} session(s) ended on an unexpected node")
+    return 1 if args.check and failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=str(SCENARIO_FILE), help="JSON list of {name, turns, expect_node}")
+    parser.add_argument("--sessions", type=int, default=None, help="defaults to one per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds-per-word", type=float, default=0.0, help="simulated speech duration")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if any scenario ends on the wrong node")
+    add_config_args(parser)
+    args = parser.parse_args()
+    if args.sessions is None:
+        args.sessions = len(json.loads(Path(args.scenarios).read_text()))
+    sys.exit(asyncio.run(main(args)))
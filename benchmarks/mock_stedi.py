@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Stedi eligibility endpoint.
+
+Serves recorded response fixtures from benchmarks/fixtures/stedi with a
+configurable latency distribution and error rate, so the client can be load
+tested without touching healthcare.us.stedi.com. Point the agent at it with
+STEDI_API_URL=http://127.0.0.1:8089/eligibility/v3
+
+    python benchmarks/mock_stedi.py --latency lognormal:0.4,0.5 --error-rate 0.02 \\
+        --mix active_in_network=0.8,inactive=0.1,missing_plan_status=0.1
+
+A request whose memberId equals a fixture name without underscores (e.g.
+"INACTIVE", "MISSINGPLANSTATUS") always gets that fixture, which makes
+scripted scenarios deterministic.
+"""
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "stedi"
+ELIGIBILITY_PATH = "/eligibility/v3"
+
+
+def load_fixtures(fixture_dir: Path = FIXTURE_DIR) -> Dict[str, bytes]:
+    """Fixture name -> raw JSON body"""
+    return {path.stem: path.read_bytes() for path in sorted(fixture_dir.glob("*.json"))}
+
+
+@dataclass
+class LatencyModel:
+    """Per-request delay in seconds: fixed, uniform(low, high) or lognormal(median, sigma)"""
+    kind: str = "fixed"
+    params: Tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, raw = spec.partition(":")
+        params = tuple(float(p) for p in raw.split(",") if p) or (0.0,)
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency model: {kind}")
+        return cls(kind=kind, params=params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * rng.lognormvariate(0.0, sigma)
+        return self.params[0]
+
+
+@dataclass
+class MockStediConfig:
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    error_rate: float = 0.0
+    error_statuses: List[int] = field(default_factory=lambda: [500, 502, 503, 429])
+    mix: Dict[str, float] = field(default_factory=lambda: {"active_in_network": 1.0})
+    seed: Optional[int] = None
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1.0)
+    return mix
+
+
+def create_app(config: MockStediConfig, fixtures: Optional[Dict[str, bytes]] = None) -> web.Application:
+    fixtures = fixtures if fixtures is not None else load_fixtures()
+    unknown = set(config.mix) - set(fixtures)
+    if unknown:
+        raise ValueError(f"Unknown fixtures in mix: {', '.join(sorted(unknown))}")
+    rng = random.Random(config.seed)
+    names = list(config.mix)
+    by_member_id = {name.replace("_", ""): name for name in fixtures}
+    weights = [config.mix[name] for name in names]
+    stats = {"requests": 0, "errors": 0}
+
+    async def eligibility(request: web.Request) -> web.Response:
+        stats["requests"] += 1
+        if not request.headers.get("Authorization", "").startswith("Key "):
+            return web.json_response({"message": "Unauthorized"}, status=401)
+        payload = await request.json()
+        await asyncio.sleep(config.latency.sample(rng))
+
+        if rng.random() < config.error_rate:
+            stats["errors"] += 1
+            status = rng.choice(config.error_statuses)
+            return web.json_response({"message": f"Mock upstream error {status}"}, status=status)
+
+        member_id = payload.get("subscriber", {}).get("memberId", "").lower().replace("_", "")
+        name = by_member_id.get(member_id) or rng.choices(names, weights)[0]
+        return web.Response(body=fixtures[name], content_type="application/json")
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post(ELIGIBILITY_PATH, eligibility)
+    app.router.add_get("/health", health)
+    app["stats"] = stats
+    return app
+
+
+async def start_server(config: MockStediConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """Run the mock in the current event loop. Returns the runner and the eligibility URL."""
+    runner = web.AppRunner(create_app(config), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}{ELIGIBILITY_PATH}"
+
+
+def add_config_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="fixed:0.0",
+                        help="fixed:S | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an HTTP error")
+    parser.add_argument("--mix", default="active_in_network=1",
+                        help="weighted fixtures, e.g. active_in_network=0.8,inactive=0.2")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> MockStediConfig:
+    return MockStediConfig(
+        latency=LatencyModel.parse(args.latency),
+        error_rate=args.error_rate,
+        mix=parse_mix(args.mix),
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_config_args(parser)
+    args = parser.parse_args()
+    print(f"Fixtures: {', '.join(load_fixtures())}")
+    web.run_app(create_app(config_from_args(args)), host=args.host, port=args.port, access_log=None)
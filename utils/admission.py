@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import JobRequest
+from livekit.agents.utils import MovingAverage
+from livekit.agents.utils.hw import get_cpu_monitor
+from livekit.agents.vad import VAD
+from livekit.plugins import silero
+
+from utils.log_pipeline import fields
+
+logger = logging.getLogger(__name__)
+
+# Load above which the worker stops taking calls; livekit requires < 1 in production
+LOAD_THRESHOLD = float(os.getenv("WORKER_LOAD_THRESHOLD") or "0.75")
+# Concurrent calls per core before turn latency regresses, see benchmarks/bench_capacity.py
+SESSIONS_PER_CORE = float(os.getenv("WORKER_SESSIONS_PER_CORE") or "8")
+# Fraction of one core a call's VAD uses; measured by prewarm() when unset
+VAD_CPU_PER_SESSION = float(os.getenv("VAD_CPU_PER_SESSION") or "0") or None
+# Accepted jobs count against capacity until they show up in worker.active_jobs
+PENDING_JOB_TIMEOUT = 10.0
+CPU_SAMPLE_INTERVAL = 0.5
+
+
+def measure_vad_cpu(vad: Optional[VAD] = None, seconds: float = 3.0, sample_rate: int = 48000) -> float:
+    """
+    Fraction of one core a Silero VAD stream needs to keep up with one caller.
+
+    Pushes `seconds` of noise at the room's sample rate through a real stream
+    (resampling included) as fast as it will go and divides the CPU time by the
+    audio duration.
+    """
+    vad = vad or silero.VAD.load()
+    frame_samples = sample_rate // 100
+    audio = np.random.default_rng(0).normal(0, 2000, int(sample_rate * seconds)).astype(np.int16)
+
+    async def run() -> None:
+        stream = vad.stream()
+        for start in range(0, len(audio) - frame_samples + 1, frame_samples):
+            stream.push_frame(rtc.AudioFrame(audio[start:start + frame_samples].tobytes(), sample_rate, 1, frame_samples))
+        stream.end_input()
+        async for _ in stream:
+            pass
+
+    started = time.process_time()
+    asyncio.run(run())
+    return (time.process_time() - started) / seconds
+
+
+class AdmissionController:
+    """
+    Worker load for livekit's load_fnc/request_fnc, the worst of three signals:
+
+      cpu       measured CPU use, moving average over the last 2.5s
+      vad       CPU the calls' VAD streams need, sessions x per-call cost / cores;
+                leads the measured CPU for calls that have only just started
+      sessions  calls on the worker, scaled so sessions_per_core x cores lands
+                exactly on the threshold
+
+    Silero runs on the worker's CPU, so going past any of these slows down
+    end-of-speech detection for every call on the box, not just the new one.
+    """
+    def __init__(
+        self,
+        threshold: float = LOAD_THRESHOLD,
+        sessions_per_core: float = SESSIONS_PER_CORE,
+        vad_cpu_per_session: Optional[float] = VAD_CPU_PER_SESSION
+    ) -> None:
+        self.threshold = threshold
+        self.sessions_per_core = sessions_per_core
+        self.vad_cpu_per_session = vad_cpu_per_session or 0.0
+        self._cpu_monitor = get_cpu_monitor()
+        self.cores = self._cpu_monitor.cpu_count()
+        self._cpu = MovingAverage(5)
+        self._lock = threading.Lock()
+        self._active: Set[str] = set()
+        # job id -> when it was accepted
+        self._pending: Dict[str, float] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self._prewarm_lock = threading.Lock()
+
+    @property
+    def max_sessions(self) -> float:
+        return self.sessions_per_core * self.cores
+
+    def prewarm(self) -> None:
+        """Measure the VAD cost (unless configured) and start sampling CPU. Runs once, in the process that calls it."""
+        with self._prewarm_lock:
+            if self._sampler is not None:
+                return
+            if not self.vad_cpu_per_session:
+                self.vad_cpu_per_session = measure_vad_cpu()
+            self._sampler = threading.Thread(target=self._sample_cpu, daemon=True, name="admission_cpu_sampler")
+            self._sampler.start()
+        logger.info("Admission control ready", extra=fields(
+            threshold=self.threshold,
+            cores=self.cores,
+            max_sessions=self.max_sessions,
+            vad_cpu_per_session=round(self.vad_cpu_per_session, 4),
+        ))
+
+    def _sample_cpu(self) -> None:
+        while True:
+            sample = self._cpu_monitor.cpu_percent(interval=CPU_SAMPLE_INTERVAL)
+            with self._lock:
+                self._cpu.add_sample(sample)
+
+    def signals(self, extra_sessions: int = 0) -> Dict[str, float]:
+        """The three load signals, with `extra_sessions` more calls than are running now"""
+        with self._lock:
+            now = time.monotonic()
+            for job_id, accepted_at in list(self._pending.items()):
+                if job_id in self._active or now - accepted_at > PENDING_JOB_TIMEOUT:
+                    del self._pending[job_id]
+            sessions = len(self._active) + len(self._pending) + extra_sessions
+            cpu = self._cpu.get_avg()
+        extra_cpu = extra_sessions * self.vad_cpu_per_session / self.cores
+        return {
+            "cpu": min(1.0, cpu + extra_cpu),
+            "vad": sessions * self.vad_cpu_per_session / self.cores,
+            "sessions": self.threshold * sessions / self.max_sessions,
+        }
+
+    def load(self, worker: Any = None) -> float:
+        """
+        WorkerOptions.load_fnc: called by livekit every 0.5s from a worker thread.
+        The first call prewarms, so it happens in the process that runs the worker
+        (under `dev` that is the reloader's child, not the process that ran main).
+        """
+        if self._sampler is None:
+            self.prewarm()
+        if worker is not None:
+            active = {info.job.id for info in worker.active_jobs}
+            with self._lock:
+                self._active = active
+        return max(self.signals().values())
+
+    def admit(self, job_id: str) -> bool:
+        """Reserve a slot for a job if taking it keeps the worker at or under the threshold"""
+        signals = self.signals(extra_sessions=1)
+        if max(signals.values()) > self.threshold:
+            logger.warning("Worker at capacity, rejecting job", extra=fields(
+                job_id=job_id, **{k: round(v, 3) for k, v in signals.items()}
+            ))
+            return False
+        with self._lock:
+            self._pending[job_id] = time.monotonic()
+        return True
+
+
+_admission: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the worker's admission controller"""
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController()
+    return _admission
+
+
+def worker_load(worker: Any) -> float:
+    """WorkerOptions.load_fnc"""
+    return get_admission_controller().load(worker)
+
+
+async def request_job(request: JobRequest) -> None:
+    """
+    WorkerOptions.request_fnc. livekit only refreshes the worker's load every
+    0.5s, so a burst of dispatches could all land on a worker that looked idle;
+    each accepted job is counted against capacity straight away.
+    """
+    if get_admission_controller().admit(request.id):
+        await request.accept()
+    else:
+        await request.reject()
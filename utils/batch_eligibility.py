@@ -0,0 +1,195 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Set, TextIO, Tuple
+
+from utils.eligibility_cache import EligibilityCache, cached_check_insurance_eligibility, eligibility_cache_key
+from utils.normalize import normalize_date
+from utils.eligibility_parser import eligibility_from_result
+from utils.validate_insuance import validate_eligibility
+
+logger = logging.getLogger(__name__)
+
+# Stedi's default eligibility quota; raise these if the account has a higher one
+BATCH_RATE_PER_SECOND = float(os.getenv("STEDI_RATE_LIMIT") or "5")
+BATCH_CONCURRENCY = int(os.getenv("STEDI_BATCH_CONCURRENCY") or "5")
+# Pre-visit results stay valid for the day of the appointment
+BATCH_CACHE_TTL = 24 * 3600.0
+REQUIRED_FIELDS = ("first_name", "last_name", "insurance_id", "date_of_birth")
+
+# Roster row -> check_insurance_eligibility arguments
+RequestBuilder = Callable[[Dict[str, str]], Dict[str, Any]]
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second on average, bursts of up to `capacity`"""
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BatchStats:
+    total: int = 0
+    skipped: int = 0
+    checked: int = 0
+    failed: int = 0
+    invalid: int = 0
+
+
+def read_roster(path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Stream (row number, row) from a .csv file or a JSONL file, one row in memory at a time"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row_number, row in enumerate(csv.DictReader(f), start=1):
+                yield row_number, {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        else:
+            for row_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield row_number, {k: str(v).strip() for k, v in json.loads(line).items()}
+
+
+def roster_state(row: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """Roster row in the shape of the voice flow's session state, or None if a field is missing or unreadable"""
+    if any(not row.get(name) for name in REQUIRED_FIELDS):
+        return None
+    dob = row["date_of_birth"]
+    # Rosters usually already carry Stedi's YYYYMMDD format
+    date_of_birth = dob if dob.isdigit() and len(dob) == 8 else normalize_date(dob)
+    if date_of_birth is None:
+        return None
+    return {**row, "date_of_birth": date_of_birth}
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Checkpoint key for a request, the same PHI-free hash the eligibility cache uses"""
+    return eligibility_cache_key(
+        request["trading_partner_id"], request["insurance_id"], request["date_of_birth"],
+        request["first_name"], request["last_name"]
+    )
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """Keys already written to the output file by an earlier, possibly interrupted, run"""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partial last line from a killed run, that row is retried
+                continue
+            # Failed checks are retried on resume; invalid rows would only fail again
+            if record.get("key") and (record.get("success") or record.get("error_type") == "invalid_row"):
+                done.add(record["key"])
+    return done
+
+
+async def run_batch(
+    roster_path: str,
+    output_path: str,
+    build_request: RequestBuilder,
+    concurrency: int = BATCH_CONCURRENCY,
+    rate: float = BATCH_RATE_PER_SECOND,
+    cache: Optional[EligibilityCache] = None
+) -> BatchStats:
+    """
+    Check every roster row against Stedi and append one JSON line per row to output_path.
+
+    Rows whose key is already in the output with a successful check are skipped, so
+    an interrupted run can be restarted with the same arguments. Successful checks
+    also land in the eligibility cache, where the voice flow finds them when the
+    patient calls.
+    """
+    cache = cache or EligibilityCache(ttl_seconds=BATCH_CACHE_TTL)
+    done = load_checkpoint(output_path)
+    bucket = TokenBucket(rate)
+    queue: "asyncio.Queue[Optional[Tuple[int, Dict[str, str]]]]" = asyncio.Queue(maxsize=concurrency * 2)
+    stats = BatchStats()
+
+    def write(out: TextIO, record: Dict[str, Any]) -> None:
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+    async def check(out: TextIO, row_number: int, row: Dict[str, str]) -> None:
+        state = roster_state(row)
+        if state is None:
+            key = f"row-{row_number}"
+            if key in done:
+                stats.skipped += 1
+                return
+            stats.invalid += 1
+            write(out, {"row": row_number, "id": row.get("id"), "key": key, "success": False, "error_type": "invalid_row"})
+            return
+        request = build_request(state)
+        key = request_key(request)
+        if key in done:
+            stats.skipped += 1
+            return
+
+        await bucket.acquire()
+        api_result = await cached_check_insurance_eligibility(**request, cache=cache)
+        record = {
+            "row": row_number,
+            "id": row.get("id"),
+            "key": key,
+            "trading_partner_id": request["trading_partner_id"],
+            "checked_at": time.time(),
+            "success": api_result["success"],
+        }
+        if api_result["success"]:
+            stats.checked += 1
+            validation = validate_eligibility(eligibility_from_result(api_result), request.get("retry_count", 0))
+            record.update({
+                "active_insurance": validation["active_insurance"],
+                "network_status": validation["network_status"],
+                "copay_amount": validation["copay_amount"],
+                "needs_representative": validation["needs_representative"],
+            })
+        else:
+            stats.failed += 1
+            record["error_type"] = api_result.get("error_type")
+        write(out, record)
+
+    async def worker(out: TextIO) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            try:
+                await check(out, *item)
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"Roster row {item[0]} failed: {e}")
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        workers = [asyncio.create_task(worker(out)) for _ in range(concurrency)]
+        for item in read_roster(roster_path):
+            stats.total += 1
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    logger.info(f"Batch eligibility finished: {stats}")
+    return stats
@@ -0,0 +1,83 @@
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List
+
+from livekit.agents.llm import ChatContext, ChatItem
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    """
+    What a flow node's LLM sees: its own instructions and only its last
+    `max_turns` caller turns, so a caller who needs many re-asks doesn't
+    grow every later prompt.
+    """
+    max_turns: int = 2
+
+
+DEFAULT_POLICY = ContextPolicy()
+
+
+def recent_turns(items: List[ChatItem], max_turns: int) -> List[ChatItem]:
+    """
+    The conversation items from the `max_turns`-th last caller message on,
+    with the assistant message it answered. Tool calls and their outputs
+    follow the caller message that caused them, so they are never split.
+    """
+    users = [i for i, item in enumerate(items) if item.type == "message" and item.role == "user"]
+    if len(users) <= max_turns:
+        return items
+    cut = users[-max_turns] if max_turns > 0 else len(items)
+    if cut > 0 and items[cut - 1].type == "message" and items[cut - 1].role == "assistant":
+        cut -= 1
+    return items[cut:]
+
+
+def trim_chat_ctx(chat_ctx: ChatContext, policy: ContextPolicy) -> ChatContext:
+    """
+    The context llm_node sends: the node's system messages and its recent
+    turns. Returned as is while it is within the cap; the agent's own
+    context is never modified.
+    """
+    instructions: List[ChatItem] = []
+    conversation: List[ChatItem] = []
+    for item in chat_ctx.items:
+        is_instruction = item.type == "message" and item.role in ("system", "developer")
+        (instructions if is_instruction else conversation).append(item)
+    recent = recent_turns(conversation, policy.max_turns)
+    if len(recent) == len(conversation):
+        return chat_ctx
+    return ChatContext([*instructions, *recent])
+
+
+class TokenUsage:
+    """LLM tokens and turns per flow node, to see what each node's prompt costs"""
+    def __init__(self) -> None:
+        self.turns: Counter = Counter()
+        self.prompt: Counter = Counter()
+        self.cached: Counter = Counter()
+        self.completion: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, node: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.turns[node] += 1
+            self.prompt[node] += prompt_tokens
+            self.cached[node] += cached_tokens
+            self.completion[node] += completion_tokens
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                node: {
+                    "turns": self.turns[node],
+                    "prompt": self.prompt[node],
+                    "cached": self.cached[node],
+                    "completion": self.completion[node],
+                }
+                for node in sorted(self.turns)
+            }
+
+
+token_usage = TokenUsage()
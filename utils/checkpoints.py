@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from utils.log_pipeline import fields
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by the worker's job processes; checkpointing is off when unset
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB") or None
+# How long after a dropped call the caller can pick up where they left off
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL") or "3600")
+# The only session.state keys written to disk: the confirmed slots a resumed call needs.
+# Raw transcripts, spoken dates and eligibility results never leave the call.
+CHECKPOINT_FIELDS = ("first_name", "last_name", "date_of_birth", "insurance_id", "insurance_validation_retry_count")
+
+
+def caller_key(identity: str) -> str:
+    """Hash of the caller's phone number or participant identity, so the number is not stored"""
+    return hashlib.sha256(identity.strip().encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Append-only log of flow transitions per caller: (node entered, confirmed slots).
+
+    append() only queues the row; a single writer thread inserts rows in
+    order, so a transition never waits on disk. resume_point() reads the
+    caller's latest rows and returns the last one at a node the call may be
+    resumed from.
+
+    The file holds patient details (PHI): it is created readable by its owner
+    only, and rows older than ttl_seconds are purged on open and on every write.
+    """
+    def __init__(self, db_path: Optional[str] = CHECKPOINT_DB, ttl_seconds: float = CHECKPOINT_TTL) -> None:
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._queue: "queue.Queue[Tuple[str, str, Dict[str, Any], float]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        if self.db_path:
+            # SQLite gives its -wal and -shm files the database file's permissions
+            os.close(os.open(self.db_path, os.O_CREAT | os.O_RDWR, 0o600))
+            os.chmod(self.db_path, 0o600)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS checkpoints ("
+                    "seq INTEGER PRIMARY KEY AUTOINCREMENT, caller TEXT NOT NULL, node TEXT NOT NULL, "
+                    "state TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_caller ON checkpoints (caller, seq)")
+                conn.execute("DELETE FROM checkpoints WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+
+    @property
+    def enabled(self) -> bool:
+        return self.db_path is not None
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, caller: Optional[str], node: str, state: Dict[str, Any]) -> None:
+        """Queue a checkpoint for a transition into `node`, keeping only CHECKPOINT_FIELDS. Never blocks."""
+        if not self.enabled or caller is None:
+            return
+        slots = {key: state[key] for key in CHECKPOINT_FIELDS if key in state}
+        self._queue.put((caller, node, slots, time.time()))
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_forever, daemon=True, name="checkpoint-writer")
+                    self._writer.start()
+
+    def _write_forever(self) -> None:
+        while True:
+            rows = [self._queue.get()]
+            while not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "INSERT INTO checkpoints (caller, node, state, created_at) VALUES (?, ?, ?, ?)",
+                        [(caller, node, json.dumps(state), created_at) for caller, node, state, created_at in rows]
+                    )
+                    conn.execute("DELETE FROM checkpoints WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.warning("Checkpoint write failed", extra=fields(rows=len(rows), error=str(e)))
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued checkpoint is on disk"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def _latest(self, caller: str, limit: int = 32) -> Iterable[Tuple[str, str]]:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT node, state FROM checkpoints WHERE caller = ? AND created_at > ? ORDER BY seq DESC LIMIT ?",
+                (caller, time.time() - self.ttl_seconds, limit)
+            ).fetchall()
+
+    def resume_point(
+        self,
+        caller: str,
+        resumable: Iterable[str],
+        finished: Iterable[str] = ()
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        (node, confirmed slots) of the caller's latest checkpoint at a `resumable` node,
+        None if there is none or the caller's last call reached a `finished` node.
+        """
+        if not self.enabled:
+            return None
+        resumable, finished = set(resumable), set(finished)
+        for node, state in self._latest(caller):
+            if node in finished:
+                return None
+            if node in resumable:
+                return node, json.loads(state)
+        return None
+
+
+_checkpoints: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Return the process-wide checkpoint store"""
+    global _checkpoints
+    if _checkpoints is None:
+        _checkpoints = CheckpointStore()
+    return _checkpoints
+
+
+async def flush_checkpoints() -> None:
+    """JobContext shutdown callback: make sure the call's last transition is saved"""
+    await asyncio.to_thread(get_checkpoint_store().flush)
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from utils.eligibility_parser import Eligibility
+from utils.validate_insuance import resilient_check_insurance_eligibility, DEFAULT_TRADING_PARTNER_ID
+
+logger = logging.getLogger(__name__)
+
+ELIGIBILITY_CACHE_TTL = float(os.getenv("ELIGIBILITY_CACHE_TTL", "900"))
+ELIGIBILITY_CACHE_ERROR_TTL = float(os.getenv("ELIGIBILITY_CACHE_ERROR_TTL", "60"))
+ELIGIBILITY_CACHE_DB = os.getenv("ELIGIBILITY_CACHE_DB") or None
+
+
+def eligibility_cache_key(
+    trading_partner_id: str,
+    insurance_id: str,
+    date_of_birth: str,
+    first_name: str,
+    last_name: str
+) -> str:
+    """Hash of the normalized subscriber fields, so no PHI is stored in the key."""
+    parts = [
+        trading_partner_id.strip(),
+        "".join(insurance_id.split()).upper(),
+        date_of_birth.strip(),
+        first_name.strip().lower(),
+        last_name.strip().lower(),
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def is_definitive(result: Dict[str, Any]) -> bool:
+    """An active plan for the subscriber with no payer errors; anything else may change on a retry"""
+    eligibility = Eligibility.from_dict(result["eligibility"])
+    return (
+        eligibility.has_subscriber
+        and eligibility.has_plan_status
+        and not eligibility.has_errors
+        and eligibility.active_coverage
+    )
+
+
+class EligibilityCache:
+    """
+    TTL cache of successful Stedi eligibility responses. Active coverage is kept
+    for ttl_seconds; payer errors, missing plans and inactive answers only for
+    error_ttl_seconds.
+
+    Lookups check an in-memory tier first, then an optional SQLite file shared by
+    every worker process on the host. Concurrent lookups for the same key are
+    collapsed into a single in-flight Stedi request.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = ELIGIBILITY_CACHE_TTL,
+        error_ttl_seconds: float = ELIGIBILITY_CACHE_ERROR_TTL,
+        db_path: Optional[str] = ELIGIBILITY_CACHE_DB,
+        max_entries: int = 1024
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.error_ttl_seconds = error_ttl_seconds
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS eligibility ("
+                    "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, result TEXT NOT NULL)"
+                )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT expires_at, result FROM eligibility WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _db_put(self, key: str, expires_at: float, result: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO eligibility (key, expires_at, result) VALUES (?, ?, ?)",
+                (key, expires_at, json.dumps(result))
+            )
+            conn.execute("DELETE FROM eligibility WHERE expires_at <= ?", (time.time(),))
+
+    def _remember(self, key: str, expires_at: float, result: Dict[str, Any]) -> None:
+        self._memory[key] = (expires_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                return entry[1]
+            del self._memory[key]
+        if self.db_path:
+            try:
+                entry = await asyncio.to_thread(self._db_get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Eligibility cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                self._remember(key, *entry)
+                return entry[1]
+        return None
+
+    async def put(self, key: str, result: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds
+        expires_at = time.time() + ttl_seconds
+        self._remember(key, expires_at, result)
+        if self.db_path:
+            try:
+                await asyncio.to_thread(self._db_put, key, expires_at, result)
+            except sqlite3.Error as e:
+                logger.warning(f"Eligibility cache write failed: {e}")
+
+    async def _fetch_and_store(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        result = await fetch()
+        # Only cache real answers from Stedi, never transport or configuration errors.
+        # Payer rejections and inactive plans are often fixed within minutes (a typo'd
+        # ID, coverage being loaded), so those expire much sooner than active coverage.
+        if result.get("success"):
+            if is_definitive(result):
+                await self.put(key, result)
+            elif self.error_ttl_seconds > 0:
+                await self.put(key, result, self.error_ttl_seconds)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        cached = await self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+_eligibility_cache: Optional[EligibilityCache] = None
+
+
+def get_eligibility_cache() -> EligibilityCache:
+    """Return the process-wide eligibility cache"""
+    global _eligibility_cache
+    if _eligibility_cache is None:
+        _eligibility_cache = EligibilityCache()
+    return _eligibility_cache
+
+
+async def cached_check_insurance_eligibility(
+    first_name: str,
+    last_name: str,
+    insurance_id: str,
+    date_of_birth: str,
+    retry_count: int = 0,
+    trading_partner_id: str = DEFAULT_TRADING_PARTNER_ID,
+    cache: Optional[EligibilityCache] = None
+) -> Dict[str, Any]:
+    """
+    check_insurance_eligibility() backed by the eligibility cache, retried through
+    the Stedi resilience policy on a miss.
+
+    Returns the same dictionary shape as check_insurance_eligibility.
+    """
+    cache = cache or get_eligibility_cache()
+    key = eligibility_cache_key(
+        trading_partner_id, insurance_id, date_of_birth, first_name, last_name
+    )
+    return await cache.get_or_fetch(
+        key,
+        lambda: resilient_check_insurance_eligibility(
+            first_name=first_name,
+            last_name=last_name,
+            insurance_id=insurance_id,
+            date_of_birth=date_of_birth,
+            retry_count=retry_count,
+            trading_partner_id=trading_partner_id
+        )
+    )
+
+
+async def cached_eligibility_result(
+    first_name: str,
+    last_name: str,
+    insurance_id: str,
+    date_of_birth: str,
+    retry_count: int = 0,
+    trading_partner_id: str = DEFAULT_TRADING_PARTNER_ID,
+    cache: Optional[EligibilityCache] = None
+) -> Optional[Dict[str, Any]]:
+    """Cached result for these details (e.g. from the pre-visit batch), without calling Stedi"""
+    cache = cache or get_eligibility_cache()
+    key = eligibility_cache_key(
+        trading_partner_id, insurance_id, date_of_birth, first_name, last_name
+    )
+    return await cache.get(key)
@@ -0,0 +1,330 @@
+import codecs
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
+
+# Top-level arrays decoded one element at a time; they are the part of the body that grows with the plan
+STREAMED_ARRAYS = frozenset({"planStatus", "benefitsInformation"})
+# Only needed to tell whether a body that was cut short carries errors further down
+ERRORS_TOKEN = b'"errors"'
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_SEPARATOR = re.compile(r"[ \t\n\r]*,?[ \t\n\r]*")
+_INCOMPLETE = object()
+
+# Parser states
+_START, _KEY, _COLON, _VALUE, _ARRAY, _END = range(6)
+
+
+@dataclass(frozen=True)
+class Eligibility:
+    """The parts of a Stedi eligibility response the call flow decides on"""
+    has_subscriber: bool = False
+    has_plan_status: bool = False
+    has_errors: bool = False
+    active_coverage: bool = False
+    has_office_visit_coverage: bool = False
+    copay_amount: Optional[str] = None
+    # "in-network", "out-of-network" or "unknown"
+    network_status: str = "unknown"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Eligibility":
+        return cls(**data)
+
+
+def plan_is_active(plan: Dict[str, Any]) -> bool:
+    """Health Benefit Plan Coverage (service type 30) with an active status"""
+    return "30" in plan.get("serviceTypeCodes", []) and (
+        plan.get("status") == "Active Coverage" or plan.get("statusCode") == "1"
+    )
+
+
+def is_office_copay(benefit: Dict[str, Any]) -> bool:
+    """Copay (code B) for Professional/Physician Visit - Office (service type 98)"""
+    return "98" in benefit.get("serviceTypeCodes", []) and benefit.get("code") == "B"
+
+
+def network_status(benefit: Dict[str, Any]) -> str:
+    network_code = benefit.get("inPlanNetworkIndicatorCode")
+    network_indicator = benefit.get("inPlanNetworkIndicator")
+    if network_code == "Y" or network_indicator == "Yes":
+        return "in-network"
+    if network_code == "N" or network_indicator == "No":
+        return "out-of-network"
+    return "unknown"
+
+
+def _office_copay_eligibility(copay: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if copay is None:
+        return {}
+    return {
+        "has_office_visit_coverage": True,
+        "copay_amount": copay.get("benefitAmount"),
+        "network_status": network_status(copay),
+    }
+
+
+def eligibility_from_response(response_data: Dict[str, Any]) -> Eligibility:
+    """Eligibility from an already decoded response body"""
+    plans = response_data.get("planStatus") or []
+    benefits = response_data.get("benefitsInformation") or []
+    return Eligibility(
+        has_subscriber=bool(response_data.get("subscriber")),
+        has_plan_status=bool(plans),
+        has_errors=bool(response_data.get("errors")),
+        active_coverage=any(plan_is_active(plan) for plan in plans),
+        **_office_copay_eligibility(next((b for b in benefits if is_office_copay(b)), None)),
+    )
+
+
+def eligibility_from_result(api_result: Dict[str, Any]) -> Eligibility:
+    """Eligibility from a successful check_insurance_eligibility() result, including ones cached before it streamed"""
+    if "eligibility" in api_result:
+        return Eligibility.from_dict(api_result["eligibility"])
+    return eligibility_from_response(api_result["data"])
+
+
+class EligibilityStreamParser:
+    """
+    Incremental parser for a Stedi eligibility response body.
+
+    feed() takes the body in chunks as they arrive. Only `subscriber`, `errors`,
+    `planStatus` and `benefitsInformation` are decoded, the two arrays one
+    element at a time, and decoding stops as soon as the outcome is settled
+    (e.g. an active plan and the office copay have been seen). Chunks after
+    that are only kept so close() can check them for a trailing top-level
+    `errors` key, the one thing that could still change the outcome.
+    """
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._text = ""
+        self._pos = 0
+        self._state = _START
+        self._key: Optional[str] = None
+        self._tail: List[bytes] = []
+        # Set when the undecoded rest of the body mentions "errors" somewhere
+        self._errors_ahead = False
+        self._overlap = b""
+        self._stop_early = True
+        self.stopped_early = False
+        self.elements_decoded = 0
+
+        # None until the key has been seen
+        self._subscriber: Optional[bool] = None
+        self._plan_status: Optional[bool] = None
+        self._errors: Optional[bool] = None
+        self._plans_done = False
+        self._active = False
+        self._copay: Optional[Dict[str, Any]] = None
+
+    @property
+    def decided(self) -> bool:
+        """True once the rest of the body can no longer change the outcome, barring a top-level errors key"""
+        if self._subscriber is None:
+            return False
+        if not self._subscriber:
+            return True
+        if self._plan_status is None:
+            return False
+        if not self._plan_status or self._errors:
+            return True
+        if self._active:
+            return self._copay is not None
+        return self._plans_done
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse another chunk of the body. Returns True once the outcome is decided."""
+        if self.stopped_early:
+            self._tail.append(chunk)
+            if not self._errors_ahead:
+                # Carry the end of the previous chunk over in case the token straddles two
+                window = self._overlap + chunk
+                self._errors_ahead = ERRORS_TOKEN in window
+                self._overlap = window[1 - len(ERRORS_TOKEN):]
+            return True
+        self._text = self._text[self._pos:] + self._decoder.decode(chunk)
+        self._pos = 0
+        self._run(final=False)
+        return self.stopped_early
+
+    def close(self) -> Eligibility:
+        """
+        Finish the body and return the result. Raises ValueError if the parsed
+        part is not valid JSON or the object is cut short before a decision.
+        """
+        if self.stopped_early:
+            if self._errors is None and self._errors_ahead:
+                # Might be the top-level errors key, parse the remainder properly
+                self._stop_early = False
+                self.stopped_early = False
+                self._text = self._text[self._pos:] + self._decoder.decode(b"".join(self._tail), final=True)
+                self._pos = 0
+                self._run(final=True)
+        else:
+            self._text = self._text[self._pos:] + self._decoder.decode(b"", final=True)
+            self._pos = 0
+            self._run(final=True)
+        if not self.stopped_early and self._state != _END:
+            raise ValueError("Eligibility response ended before the JSON object did")
+        return self.result()
+
+    def result(self) -> Eligibility:
+        return Eligibility(
+            has_subscriber=bool(self._subscriber),
+            has_plan_status=bool(self._plan_status),
+            has_errors=bool(self._errors),
+            active_coverage=self._active,
+            **_office_copay_eligibility(self._copay),
+        )
+
+    def _decode(self, pos: int, final: bool) -> Tuple[Any, int]:
+        try:
+            value, end = self._json.raw_decode(self._text, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _INCOMPLETE, pos
+        # A number at the very end of the buffer may continue in the next chunk
+        if end >= len(self._text) and not final:
+            return _INCOMPLETE, pos
+        return value, end
+
+    def _on_value(self, key: str, value: Any) -> None:
+        if key == "subscriber":
+            self._subscriber = bool(value)
+        elif key == "errors":
+            self._errors = bool(value)
+        elif key in STREAMED_ARRAYS:
+            # Not an array (e.g. null): no entries
+            self._on_array_end(key)
+
+    def _on_element(self, key: str, element: Any) -> bool:
+        """Record an array element; True if it changed what we know"""
+        self.elements_decoded += 1
+        is_entry = isinstance(element, dict)
+        if key == "planStatus":
+            first = self._plan_status is None
+            self._plan_status = True
+            if is_entry and not self._active and plan_is_active(element):
+                self._active = True
+                return True
+            return first
+        if is_entry and self._copay is None and is_office_copay(element):
+            self._copay = element
+            return True
+        return False
+
+    def _on_array_end(self, key: str) -> None:
+        if key == "planStatus":
+            self._plan_status = bool(self._plan_status)
+            self._plans_done = True
+
+    def _elements(self, pos: int, final: bool) -> Tuple[int, bool]:
+        """
+        Decode the elements of a streamed array from pos, the hot loop for large
+        benefit lists. Returns the position reached and whether it is waiting for input.
+        """
+        text, key = self._text, self._key
+        skip_separator = _SEPARATOR.match
+        while True:
+            pos = skip_separator(text, pos).end()
+            if pos >= len(text):
+                return pos, True
+            if text[pos] == "]":
+                self._on_array_end(key)
+                self._state = _KEY
+                return pos + 1, False
+            element, end = self._decode(pos, final)
+            if element is _INCOMPLETE:
+                return pos, True
+            pos = end
+            if self._on_element(key, element) and self._stop_early and self.decided:
+                return pos, False
+
+    def _run(self, final: bool) -> None:
+        text = self._text
+        pos = self._pos
+        try:
+            while True:
+                if self._stop_early and self.decided:
+                    self.stopped_early = True
+                    rest = text[pos:].encode("utf-8")
+                    self._errors_ahead = ERRORS_TOKEN in rest
+                    self._overlap = rest[1 - len(ERRORS_TOKEN):]
+                    return
+                pos = _WHITESPACE.match(text, pos).end()
+                if pos >= len(text):
+                    return
+                char = text[pos]
+                if self._state == _START:
+                    if char != "{":
+                        raise ValueError("Eligibility response is not a JSON object")
+                    pos += 1
+                    self._state = _KEY
+                elif self._state == _KEY:
+                    if char == "}":
+                        pos += 1
+                        self._state = _END
+                    elif char == ",":
+                        pos += 1
+                    elif char != '"':
+                        raise ValueError(f"Expected a key at character {pos}")
+                    else:
+                        key, end = self._decode(pos, final)
+                        if key is _INCOMPLETE:
+                            return
+                        self._key, pos = key, end
+                        self._state = _COLON
+                elif self._state == _COLON:
+                    if char != ":":
+                        raise ValueError(f"Expected ':' at character {pos}")
+                    pos += 1
+                    self._state = _VALUE
+                elif self._state == _VALUE:
+                    if self._key in STREAMED_ARRAYS and char == "[":
+                        pos += 1
+                        self._state = _ARRAY
+                        continue
+                    value, end = self._decode(pos, final)
+                    if value is _INCOMPLETE:
+                        return
+                    self._on_value(self._key, value)
+                    pos = end
+                    self._state = _KEY
+                elif self._state == _ARRAY:
+                    pos, waiting = self._elements(pos, final)
+                    if waiting:
+                        return
+                else:
+                    raise ValueError(f"Unexpected data after the JSON object at character {pos}")
+        finally:
+            self._pos = pos
+
+
+def parse_eligibility(body: bytes, chunk_size: int = 0) -> Eligibility:
+    """Parse a complete body, in chunks of chunk_size bytes if given"""
+    parser = EligibilityStreamParser()
+    step = chunk_size or len(body) or 1
+    for start in range(0, len(body), step):
+        parser.feed(body[start:start + step])
+    return parser.close()
+
+
+async def read_eligibility(chunks: AsyncIterable[bytes]) -> Eligibility:
+    """
+    Parse a body from an async chunk stream, e.g. aiohttp's response.content.iter_any().
+
+    The stream is read to the end even after the outcome is decided, so the
+    connection goes back to the keep-alive pool instead of being dropped.
+    """
+    parser = EligibilityStreamParser()
+    async for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
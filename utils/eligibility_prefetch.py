@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from utils.eligibility_cache import cached_check_insurance_eligibility
+
+logger = logging.getLogger(__name__)
+
+
+class EligibilityPrefetch:
+    """
+    Eligibility check started speculatively while the caller confirms their insurance ID.
+
+    The result is only used if the confirmed request matches the one that was
+    prefetched; otherwise the task is cancelled and its result discarded.
+    """
+    def __init__(self, request: Dict[str, Any]) -> None:
+        self.request = dict(request)
+        self.task: asyncio.Task = asyncio.create_task(cached_check_insurance_eligibility(**self.request))
+        self.task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Eligibility prefetch failed: {task.exception()}")
+
+    def matches(self, request: Dict[str, Any]) -> bool:
+        return self.request == request
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+
+def take_prefetch(
+    prefetch: Optional[EligibilityPrefetch],
+    request: Dict[str, Any]
+) -> Optional[EligibilityPrefetch]:
+    """Return the prefetch if it can answer this request, cancelling it otherwise."""
+    if prefetch is None:
+        return None
+    if prefetch.matches(request) and not prefetch.task.cancelled():
+        return prefetch
+    prefetch.cancel()
+    return None
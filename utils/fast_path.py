@@ -0,0 +1,164 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from utils.normalize import MEMBER_ID_WORDS, NAME_PREFIXES, normalize_date, normalize_member_id, normalize_name
+from utils.payer_index import get_payer_index
+
+# Whole-utterance confirmations. Anything longer or mixed ("no, it's Jon") goes to the LLM.
+YES_PHRASES = {
+    "yes", "yeah", "yep", "yup", "yes please", "correct", "thats correct", "that is correct",
+    "yes thats correct", "yes that is correct", "right", "thats right", "that is right",
+    "yes thats right", "yes it is", "it is", "affirmative", "uh huh", "mhm", "sure", "exactly",
+}
+NO_PHRASES = {
+    "no", "nope", "nah", "no thats wrong", "thats wrong", "that is wrong", "wrong", "incorrect",
+    "thats incorrect", "that is incorrect", "no thats not right", "thats not right", "not right",
+    "no its not", "no it is not", "not correct", "thats not correct", "no thats incorrect",
+}
+FILLER_WORDS = {"um", "uh", "er", "ah", "well", "okay", "ok"}
+
+# Words that mean the caller said more than just the ID ("my id is ...")
+NOT_AN_ID_PREFIX = {"my", "id", "is", "its", "it", "the", "number", "insurance", "member", "and", "sure"}
+NOT_A_NAME = YES_PHRASES | NO_PHRASES | FILLER_WORDS | {
+    "hello", "hi", "hey", "what", "sorry", "pardon", "repeat", "huh", "wait", "hold", "help",
+    "thanks", "thank", "please", "bye", "goodbye", "name", "first", "last", "my", "me", "you", "i", "im",
+    "is", "its", "it", "the", "a", "and", "why", "who", "how", "again", "hmm", "hm", "speaking", "here",
+    "thats", "whats", "this", "that",
+    "representative", "operator", "agent", "human", "person", "stop", "cancel", "quit",
+}
+NAME_SLOTS = {"first_name", "last_name"}
+# Shortest member ID the fast path will take without the LLM
+MIN_MEMBER_ID_LENGTH = 6
+
+_PUNCTUATION = re.compile(r"[^\w\s'/-]")
+_NAME = re.compile(r"^[a-z][a-z'-]{0,39}$")
+_SPELLED_WITH_DASHES = re.compile(r"^[a-z](?:-[a-z])+$")
+_ID_TOKEN = re.compile(r"^(?:[a-z0-9]*\d[a-z0-9]*|[a-z])$")
+_ID_PREFIX = re.compile(r"^[a-z]{2,10}$")
+
+
+def _clean(transcript: str, keep_apostrophes: bool = False) -> str:
+    text = _PUNCTUATION.sub("", transcript.lower())
+    if not keep_apostrophes:
+        text = text.replace("'", "")
+    return " ".join(text.split())
+
+
+def normalize_transcript(transcript: str, keep_apostrophes: bool = False) -> str:
+    """Lowercase words without punctuation or fillers; names keep apostrophes ("o'brien")"""
+    text = _clean(transcript, keep_apostrophes)
+    return " ".join(word for word in text.split() if word not in FILLER_WORDS) or text
+
+
+class FastPathStats:
+    """Hit/miss counters per slot, to see how often the LLM round trip is skipped"""
+    def __init__(self) -> None:
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    def record(self, kind: str, hit: bool) -> None:
+        (self.hits if hit else self.misses)[kind] += 1
+
+    def hit_rate(self, kind: str) -> float:
+        total = self.hits[kind] + self.misses[kind]
+        return self.hits[kind] / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        kinds = set(self.hits) | set(self.misses)
+        return {
+            kind: {"hits": self.hits[kind], "misses": self.misses[kind], "hit_rate": self.hit_rate(kind)}
+            for kind in sorted(kinds)
+        }
+
+
+fast_path_stats = FastPathStats()
+
+
+def match_confirmation(transcript: str) -> Optional[bool]:
+    """True/False for an unambiguous yes or no, None if the LLM should decide"""
+    # Whole phrases first, so ones made of filler words ("uh huh") still count
+    result = None
+    for text in (_clean(transcript).replace("-", " "), normalize_transcript(transcript)):
+        result = True if text in YES_PHRASES else False if text in NO_PHRASES else None
+        if result is not None:
+            break
+    fast_path_stats.record("confirm", result is not None)
+    return result
+
+
+def _spelled(tokens: List[str]) -> Optional[str]:
+    # "j o h n" or "j-o-h-n" -> "john"
+    if len(tokens) > 1 and all(len(t) == 1 and t.isalpha() for t in tokens):
+        return "".join(tokens)
+    if len(tokens) == 1 and _SPELLED_WITH_DASHES.match(tokens[0]):
+        return tokens[0].replace("-", "")
+    return None
+
+
+def _match_name(text: str) -> Optional[str]:
+    """
+    Only names the caller marked as one: spelled out ("j o h n"), said and
+    spelled ("john j o h n") or after a lead-in ("my name is john"). A bare
+    word may as well be "representative" or "cancel", so the LLM gets those.
+    """
+    tokens = text.split()
+    plain = tuple(t.replace("'", "") for t in tokens)
+    lead_in = next((p for p in NAME_PREFIXES if plain[:len(p)] == p and len(tokens) > len(p)), ())
+    tokens = tokens[len(lead_in):]
+    name = _spelled(tokens)
+    if name is None and len(tokens) > 1 and _spelled(tokens[1:]) == re.sub(r"['-]", "", tokens[0]):
+        name = tokens[0]
+    if name is None and lead_in and len(tokens) == 1:
+        name = tokens[0]
+    if name is not None and _NAME.match(name) and name.replace("'", "") not in NOT_A_NAME:
+        return normalize_name(name)
+    return None
+
+
+def _match_insurance_id(text: str) -> Optional[str]:
+    tokens = text.replace("-", " ").split()
+    if not tokens:
+        return None
+    # Allow a known payer name spoken as a prefix, e.g. "aetna one two three"
+    first = tokens[0]
+    if (
+        _ID_PREFIX.match(first) and first not in NOT_AN_ID_PREFIX and first not in MEMBER_ID_WORDS
+        and get_payer_index().candidates(first)
+    ):
+        rest = tokens[1:]
+    else:
+        rest = tokens
+    if not rest or not all(_ID_TOKEN.match(t) or t in MEMBER_ID_WORDS for t in rest):
+        return None
+    # At least one real digit keeps single names or words from matching
+    if not any(c.isdigit() for c in text) and not any(t in MEMBER_ID_WORDS for t in tokens):
+        return None
+    # Unreadable or too short to be an ID ("one hundred", "one", "a five"), leave it to the LLM
+    member_id = normalize_member_id(" ".join(tokens))
+    if member_id is None or len(member_id) < MIN_MEMBER_ID_LENGTH:
+        return None
+    return " ".join(tokens)
+
+
+def _match_date(text: str) -> Optional[str]:
+    # Pass the caller's words through; collect() normalizes them and keeps them for the spellback
+    return text if normalize_date(text) is not None else None
+
+
+_SLOT_MATCHERS = {
+    "first_name": _match_name,
+    "last_name": _match_name,
+    "insurance_id": _match_insurance_id,
+    "date_of_birth": _match_date,
+}
+
+
+def match_slot(key: str, transcript: str) -> Optional[str]:
+    """The value to pass to collect() if the transcript is just the slot value, else None"""
+    matcher = _SLOT_MATCHERS.get(key)
+    if matcher is None:
+        return None
+    value = matcher(normalize_transcript(transcript, keep_apostrophes=key in NAME_SLOTS))
+    fast_path_stats.record(key, value is not None)
+    return value
@@ -0,0 +1,144 @@
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+logger = logging.getLogger(__name__)
+
+State = Dict[str, Any]
+# A condition is a state key (truthy check) or a function of the state, sync or async
+Condition = Union[str, Callable[[State], Union[bool, Awaitable[bool]]]]
+
+
+class FlowError(ValueError):
+    """The flow graph is malformed; raised once, when the graph is compiled"""
+
+
+@dataclass(frozen=True)
+class Branch:
+    """Conditional edge: the first case whose condition holds wins, otherwise `default`"""
+    cases: Sequence[Tuple[Condition, str]]
+    default: Optional[str] = None
+
+    @property
+    def targets(self) -> List[str]:
+        targets = [target for _, target in self.cases]
+        if self.default is not None:
+            targets.append(self.default)
+        return list(dict.fromkeys(targets))
+
+
+def confirmed(then: str, otherwise: str, key: str = "confirm") -> Branch:
+    """Edge out of a confirmation node. A missing answer counts as confirmed."""
+    return Branch(cases=[(lambda state: not state.get(key, True), otherwise)], default=then)
+
+
+@dataclass(frozen=True)
+class Node:
+    agent: Type[Any]
+    # None for a terminal node, a node name, or a Branch
+    next: Union[None, str, Branch] = None
+
+    @property
+    def targets(self) -> List[str]:
+        if self.next is None:
+            return []
+        if isinstance(self.next, str):
+            return [self.next]
+        return self.next.targets
+
+
+async def _holds(condition: Condition, state: State) -> bool:
+    if isinstance(condition, str):
+        return bool(state.get(condition))
+    result = condition(state)
+    if inspect.isawaitable(result):
+        result = await result
+    return bool(result)
+
+
+@dataclass
+class FlowGraph:
+    """
+    Declarative call flow, validated and compiled once.
+
+    Every edge target must be a node, every node must be reachable from `start`,
+    and each node's possible successors are precomputed so a FlowRunner can
+    build them ahead of time.
+    """
+    start: str
+    nodes: Dict[str, Node]
+    successors: Dict[str, Tuple[str, ...]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.start not in self.nodes:
+            raise FlowError(f"Start node '{self.start}' is not in the flow")
+        for name, node in self.nodes.items():
+            if not isinstance(node.agent, type):
+                raise FlowError(f"Node '{name}' agent must be a class, got {node.agent!r}")
+            unknown = [target for target in node.targets if target not in self.nodes]
+            if unknown:
+                raise FlowError(f"Node '{name}' has edges to unknown nodes: {', '.join(unknown)}")
+            if isinstance(node.next, Branch) and node.next.default is None and not node.next.cases:
+                raise FlowError(f"Node '{name}' has a branch with no cases and no default")
+        self.successors = {name: tuple(node.targets) for name, node in self.nodes.items()}
+
+        reachable, frontier = {self.start}, [self.start]
+        while frontier:
+            for target in self.successors[frontier.pop()]:
+                if target not in reachable:
+                    reachable.add(target)
+                    frontier.append(target)
+        unreachable = sorted(set(self.nodes) - reachable)
+        if unreachable:
+            raise FlowError(f"Nodes unreachable from '{self.start}': {', '.join(unreachable)}")
+
+    async def resolve(self, current: str, state: State) -> Optional[str]:
+        """Name of the node that follows `current` for this state, None at the end of the flow"""
+        edge = self.nodes[current].next
+        if edge is None or isinstance(edge, str):
+            return edge
+        for condition, target in edge.cases:
+            if await _holds(condition, state):
+                return target
+        return edge.default
+
+
+class FlowRunner:
+    """
+    Walks a FlowGraph for one call.
+
+    prepare() constructs the agents for every possible successor of a node, so
+    the handoff itself is an edge evaluation plus a dict lookup. Prepared
+    agents are used once; anything not taken is dropped on the next prepare().
+    """
+    def __init__(self, graph: FlowGraph, make_agent: Callable[[Type[Any]], Any]) -> None:
+        self.graph = graph
+        self.make_agent = make_agent
+        self._prepared: Dict[str, Any] = {}
+
+    def prepare(self, current: str) -> None:
+        prepared = {}
+        for target in self.graph.successors.get(current, ()):
+            agent = self._prepared.get(target)
+            prepared[target] = agent if agent is not None else self.make_agent(self.graph.nodes[target].agent)
+        self._prepared = prepared
+
+    def prepare_soon(self, current: str) -> None:
+        """Build the successors of `current` on the next loop iteration, after the handoff completes"""
+        asyncio.get_running_loop().call_soon(self.prepare, current)
+
+    def agent_for(self, node: str) -> Any:
+        agent = self._prepared.pop(node, None)
+        if agent is None:
+            agent = self.make_agent(self.graph.nodes[node].agent)
+        self.prepare_soon(node)
+        return agent
+
+    async def next_agent(self, current: str, state: State) -> Tuple[Optional[str], Optional[Any]]:
+        """Follow the edge out of `current`. Returns (next node, its agent), or (None, None) at the end."""
+        target = await self.graph.resolve(current, state)
+        if target is None:
+            return None, None
+        return target, self.agent_for(target)
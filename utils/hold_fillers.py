@@ -0,0 +1,70 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from livekit.agents.voice import SpeechHandle
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# (seconds since the request started, what to say) pairs, in order
+FillerSchedule = List[Tuple[float, str]]
+
+DEFAULT_FILLER_SCHEDULE: FillerSchedule = [
+    (6.0, "Still checking, thank you for your patience."),
+    (14.0, "This is taking a little longer than usual. Thank you for holding."),
+]
+
+
+def load_filler_schedule() -> FillerSchedule:
+    """Read the schedule from STEDI_FILLER_SCHEDULE (JSON list of [seconds, text]), or use the default"""
+    raw = os.getenv("STEDI_FILLER_SCHEDULE")
+    if not raw:
+        return list(DEFAULT_FILLER_SCHEDULE)
+    try:
+        return sorted((float(delay), str(text)) for delay, text in json.loads(raw))
+    except (ValueError, TypeError) as e:
+        logger.error(f"Invalid STEDI_FILLER_SCHEDULE, using default: {e}")
+        return list(DEFAULT_FILLER_SCHEDULE)
+
+
+async def _play_fillers(
+    say: Callable[[str], SpeechHandle],
+    schedule: FillerSchedule,
+    started_at: float,
+    playing: List[SpeechHandle]
+) -> None:
+    loop = asyncio.get_running_loop()
+    for delay, text in schedule:
+        await asyncio.sleep(max(0.0, started_at + delay - loop.time()))
+        handle = say(text)
+        playing.append(handle)
+        await handle
+
+
+async def await_with_fillers(
+    work: Awaitable[T],
+    say: Callable[[str], SpeechHandle],
+    schedule: FillerSchedule,
+    started_at: Optional[float] = None
+) -> T:
+    """
+    Await `work`, speaking each filler once its threshold passes.
+
+    Thresholds are measured from `started_at` (loop time, defaults to now). Any
+    filler still queued or playing is interrupted as soon as the work finishes.
+    """
+    if started_at is None:
+        started_at = asyncio.get_running_loop().time()
+    playing: List[SpeechHandle] = []
+    fillers = asyncio.create_task(_play_fillers(say, schedule, started_at, playing))
+    try:
+        return await work
+    finally:
+        fillers.cancel()
+        for handle in playing:
+            if not handle.done():
+                handle.interrupt()
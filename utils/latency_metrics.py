@@ -0,0 +1,330 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from livekit.agents import metrics
+from livekit.agents.voice import AgentSession, MetricsCollectedEvent
+
+from utils.chat_context import token_usage
+from utils.eligibility_cache import get_eligibility_cache
+from utils.fast_path import fast_path_stats
+from utils.log_pipeline import fields
+from utils.tts_cache import get_tts_cache
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT") or "9464")
+METRICS_DIR = os.getenv("METRICS_DIR") or os.path.join(tempfile.gettempdir(), "voice_agent_metrics")
+FLUSH_INTERVAL = 1.0
+# Totals of job processes that have exited, kept next to the live snapshots in METRICS_DIR
+RETIRED_FILE = "retired.json"
+
+# Seconds. Covers everything from a VAD decision to a slow Stedi request.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Span names, one per stage of a turn
+VAD_END_OF_SPEECH = "vad_end_of_speech"
+STT_FINAL = "stt_final"
+LLM_FIRST_TOKEN = "llm_first_token"
+TOOL_EXECUTION = "tool_execution"
+TTS_FIRST_AUDIO = "tts_first_audio"
+STEDI_REQUEST = "stedi_request"
+NODE_TRANSITION = "node_transition"
+# Job start, labelled by dependency (room, stt, llm, tts, stedi) instead of node
+STARTUP = "startup"
+
+
+class LatencyHistograms:
+    """
+    Per-process histograms of span durations, labelled by span and flow node.
+
+    Job processes flush snapshots to METRICS_DIR (one file per process,
+    named <pid>-<start time> so a reused pid never overwrites a finished
+    process's totals); the worker's /metrics endpoint merges them on scrape.
+    """
+    def __init__(self, metrics_dir: str = METRICS_DIR) -> None:
+        self.metrics_dir = Path(metrics_dir)
+        # (span, node) -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._snapshot_pid: Optional[int] = None
+        self._snapshot_name = ""
+
+    def observe(self, span: str, node: Optional[str], seconds: float) -> None:
+        key = (span, node or "")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(BUCKETS) + 2)
+            series[bisect_left(BUCKETS, seconds)] += 1
+            series[-1] += seconds
+        self._schedule_flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [
+                {"span": span, "node": node, "buckets": series[:-1], "sum": series[-1]}
+                for (span, node), series in self._series.items()
+            ]
+        return {
+            "spans": spans,
+            "fast_path": fast_path_stats.snapshot(),
+            "llm_tokens": token_usage.snapshot(),
+            "caches": {"tts": get_tts_cache().stats(), "eligibility": get_eligibility_cache().stats()},
+        }
+
+    def flush(self) -> None:
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        if self._snapshot_pid != os.getpid():
+            # Set on first flush in each process, including ones forked from a process that already flushed
+            self._snapshot_pid = os.getpid()
+            self._snapshot_name = f"{self._snapshot_pid}-{time.time_ns()}.json"
+        path = self.metrics_dir / self._snapshot_name
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+
+    def _schedule_flush(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(FLUSH_INTERVAL, self._flush_in_background, loop)
+
+    def _flush_in_background(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._flush_handle = None
+        loop.run_in_executor(None, self.flush)
+
+
+histograms = LatencyHistograms()
+
+
+def observe(span: str, node: Optional[str], seconds: float) -> None:
+    histograms.observe(span, node, seconds)
+
+
+@contextmanager
+def span(name: str, node: Optional[str]) -> Iterator[None]:
+    """Time the enclosed block and record it under (name, node)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograms.observe(name, node, time.perf_counter() - start)
+
+
+def timed_tool(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Record a tool_execution span for an agent tool. Place it under @function_tool."""
+    @functools.wraps(fn)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with span(TOOL_EXECUTION, self.session.state.get("current_node")):
+            return await fn(self, *args, **kwargs)
+    return wrapper
+
+
+def attach_session_metrics(session: AgentSession) -> None:
+    """
+    Turn the session's VAD/STT/LLM/TTS metrics events into spans tagged with
+    the current node, and count each LLM turn's tokens against it.
+    """
+    @session.on("metrics_collected")
+    def _on_metrics(ev: MetricsCollectedEvent) -> None:
+        node = session.state.get("current_node")
+        m = ev.metrics
+        if isinstance(m, metrics.EOUMetrics):
+            observe(VAD_END_OF_SPEECH, node, m.end_of_utterance_delay)
+            observe(STT_FINAL, node, m.transcription_delay)
+        elif isinstance(m, metrics.LLMMetrics):
+            observe(LLM_FIRST_TOKEN, node, m.ttft)
+            token_usage.record(node or "", m.prompt_tokens, m.prompt_cached_tokens, m.completion_tokens)
+            logger.info("llm_turn", extra=fields(
+                node=node,
+                prompt_tokens=m.prompt_tokens,
+                cached_tokens=m.prompt_cached_tokens,
+                completion_tokens=m.completion_tokens,
+            ))
+        elif isinstance(m, metrics.TTSMetrics) and m.ttfb >= 0:
+            observe(TTS_FIRST_AUDIO, node, m.ttfb)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up process snapshots into one with the same layout"""
+    series_by_key: Dict[Tuple[str, str], List[float]] = {}
+    counters: Dict[str, Dict[str, Dict[str, float]]] = {"fast_path": {}, "llm_tokens": {}, "caches": {}}
+    for data in snapshots:
+        for entry in data.get("spans", []):
+            series = series_by_key.setdefault((entry["span"], entry["node"]), [0.0] * (len(BUCKETS) + 2))
+            for i, count in enumerate(entry["buckets"] + [entry["sum"]]):
+                series[i] += count
+        for section, totals in counters.items():
+            for label, values in data.get(section, {}).items():
+                total = totals.setdefault(label, {})
+                for name, count in values.items():
+                    # Ratios like the fast path hit_rate don't add up; they are derived from the counts
+                    if name != "hit_rate":
+                        total[name] = total.get(name, 0) + count
+    spans = [
+        {"span": span_name, "node": node, "buckets": series[:-1], "sum": series[-1]}
+        for (span_name, node), series in series_by_key.items()
+    ]
+    return {"spans": spans, **counters}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_snapshot(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+_fold_lock = threading.Lock()
+
+
+def collect_snapshots(metrics_dir: str = METRICS_DIR) -> List[Dict[str, Any]]:
+    """
+    Every snapshot in metrics_dir. Snapshots of job processes that have exited
+    are folded into RETIRED_FILE and deleted, so the directory only holds live
+    processes and their totals keep counting after they are gone.
+    """
+    directory = Path(metrics_dir)
+    with _fold_lock:
+        retired_path = directory / RETIRED_FILE
+        retired = _read_snapshot(retired_path) or {}
+        live: List[Dict[str, Any]] = []
+        dead: List[Path] = []
+        for path in directory.glob("*-*.json"):
+            data = _read_snapshot(path)
+            if data is None:
+                continue
+            if _alive(int(path.name.split("-", 1)[0])):
+                live.append(data)
+            else:
+                retired = merge_snapshots([retired, data])
+                dead.append(path)
+        if dead:
+            tmp_path = retired_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(retired))
+            os.replace(tmp_path, retired_path)
+            for path in dead:
+                path.unlink(missing_ok=True)
+    return [retired, *live]
+
+
+def render_prometheus(metrics_dir: str = METRICS_DIR) -> str:
+    """Merge every process snapshot in metrics_dir into Prometheus text format"""
+    snapshot = merge_snapshots(collect_snapshots(metrics_dir))
+    merged = {(entry["span"], entry["node"]): entry["buckets"] + [entry["sum"]] for entry in snapshot["spans"]}
+    fast_path: Dict[Tuple[str, str], float] = {}
+    for slot, stats in snapshot["fast_path"].items():
+        fast_path[(slot, "hit")] = stats.get("hits", 0)
+        fast_path[(slot, "miss")] = stats.get("misses", 0)
+    tokens = {(node, kind): count for node, usage in snapshot["llm_tokens"].items() for kind, count in usage.items()}
+    caches: Dict[Tuple[str, str], float] = {}
+    for cache, stats in snapshot["caches"].items():
+        caches[(cache, "hit")] = stats.get("hits", 0)
+        caches[(cache, "miss")] = stats.get("misses", 0)
+
+    lines = [
+        "# HELP voice_agent_span_seconds Duration of each stage of a call turn, by flow node.",
+        "# TYPE voice_agent_span_seconds histogram",
+    ]
+    for (span_name, node), series in sorted(merged.items()):
+        labels = f'span="{_label(span_name)}",node="{_label(node)}"'
+        cumulative = 0.0
+        for bound, count in zip(BUCKETS, series):
+            cumulative += count
+            lines.append(f'voice_agent_span_seconds_bucket{{{labels},le="{bound}"}} {cumulative:g}')
+        cumulative += series[len(BUCKETS)]
+        lines.append(f'voice_agent_span_seconds_bucket{{{labels},le="+Inf"}} {cumulative:g}')
+        lines.append(f"voice_agent_span_seconds_sum{{{labels}}} {series[-1]:.6f}")
+        lines.append(f"voice_agent_span_seconds_count{{{labels}}} {cumulative:g}")
+
+    lines.append("# HELP voice_agent_fast_path_total Turns handled by the deterministic fast path vs. the LLM.")
+    lines.append("# TYPE voice_agent_fast_path_total counter")
+    for (slot, result), count in sorted(fast_path.items()):
+        lines.append(f'voice_agent_fast_path_total{{slot="{_label(slot)}",result="{result}"}} {count:g}')
+
+    lines.append("# HELP voice_agent_cache_total Lookups in the TTS prompt cache and the eligibility result cache.")
+    lines.append("# TYPE voice_agent_cache_total counter")
+    for (cache, result), count in sorted(caches.items()):
+        lines.append(f'voice_agent_cache_total{{cache="{cache}",result="{result}"}} {count:g}')
+
+    lines.append("# HELP voice_agent_llm_turns_total LLM requests by flow node.")
+    lines.append("# TYPE voice_agent_llm_turns_total counter")
+    for (node, kind), count in sorted(tokens.items()):
+        if kind == "turns":
+            lines.append(f'voice_agent_llm_turns_total{{node="{_label(node)}"}} {count:g}')
+    lines.append("# HELP voice_agent_llm_tokens_total LLM tokens by flow node; divide by voice_agent_llm_turns_total for tokens per turn.")
+    lines.append("# TYPE voice_agent_llm_tokens_total counter")
+    for (node, kind), count in sorted(tokens.items()):
+        if kind != "turns":
+            lines.append(f'voice_agent_llm_tokens_total{{node="{_label(node)}",kind="{kind}"}} {count:g}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus(self.server.metrics_dir).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, metrics_dir: str = METRICS_DIR) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics from the worker's main process on a background thread.
+
+    Clears old snapshots and exports METRICS_DIR so job processes write to the same place.
+    Set METRICS_PORT=0 to disable.
+    """
+    if port <= 0:
+        return None
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    except OSError as e:
+        # Most likely another worker on this host already serves the port (and owns
+        # METRICS_DIR, so its snapshots are left alone); calls work without it
+        logger.error(f"Could not serve latency metrics on :{port}: {e}")
+        return None
+    Path(metrics_dir).mkdir(parents=True, exist_ok=True)
+    for old in Path(metrics_dir).glob("*.json"):
+        old.unlink(missing_ok=True)
+    os.environ["METRICS_DIR"] = metrics_dir
+    server.metrics_dir = metrics_dir
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving latency metrics on :{port}/metrics")
+    return server
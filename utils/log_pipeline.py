@@ -0,0 +1,131 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Iterable, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL") or "INFO"
+# Loggers owned by this project; livekit's own loggers are left alone
+APP_LOGGERS = ("declarative-flow", "utils")
+
+# Field names whose values are patient data, in our state and in Stedi payloads
+PHI_FIELDS = frozenset({
+    "first_name", "last_name", "name", "insurance_id", "member_id", "date_of_birth", "dob_raw", "string_date",
+    "firstName", "lastName", "middleName", "memberId", "dateOfBirth", "ssn", "address", "address1", "address2",
+    "city", "postalCode", "phone", "email", "value", "transcript",
+})
+REDACTED = "[REDACTED]"
+
+
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for part in filter(None, spec.split(",")):
+        event, _, rate = part.partition("=")
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+# Fraction of INFO/DEBUG records kept per message, e.g. "stedi_request=0.1". Warnings and errors are never sampled.
+SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES") or "stedi_request=0.1,spellback=0.1")
+
+
+def fields(**kwargs: Any) -> Dict[str, Any]:
+    """Structured fields for a log call: logger.info("event", extra=fields(node=..., first_name=...))"""
+    return {"fields": kwargs}
+
+
+def redact(value: Any) -> Any:
+    """Copy of value with every PHI field, at any depth, replaced by a placeholder"""
+    if isinstance(value, dict):
+        return {k: REDACTED if k in PHI_FIELDS and v not in (None, "") else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, redacted fields and exception text"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        extra = getattr(record, "fields", None)
+        if extra:
+            entry.update(redact(extra))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of high-volume INFO/DEBUG records, keyed by their message"""
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.msg) if isinstance(record.msg, str) else None
+        return rate is None or random.random() < rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. The event loop
+    only copies the record and enqueues it; JSON encoding, redaction and the
+    write to stdout all happen in the background.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Resolve %-args now, they may be mutated after this call returns
+        record.msg = record.getMessage()
+        record.args = None
+        if isinstance(getattr(record, "fields", None), dict):
+            record.fields = dict(record.fields)
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = LOG_LEVEL, loggers: Iterable[str] = APP_LOGGERS) -> None:
+    """
+    Route the project's loggers through a queue to a background writer thread.
+
+    Safe to call more than once per process (prewarm and the batch CLI both do).
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(SAMPLE_RATES))
+    for name in loggers:
+        app_logger = logging.getLogger(name)
+        app_logger.handlers = [handler]
+        app_logger.setLevel(level)
+        app_logger.propagate = False
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
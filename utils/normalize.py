@@ -0,0 +1,295 @@
+import datetime
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+# ---------------------------------------------------------------------------
+# Lookup tables, built once at import
+# ---------------------------------------------------------------------------
+
+UNITS = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+}
+TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7,
+    "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13,
+    "fourteenth": 14, "fifteenth": 15, "sixteenth": 16, "seventeenth": 17, "eighteenth": 18,
+    "nineteenth": 19, "twentieth": 20, "thirtieth": 30,
+}
+REPEATS = {"double": 2, "triple": 3}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+NATO = {
+    "alpha": "A", "bravo": "B", "charlie": "C", "delta": "D", "echo": "E", "foxtrot": "F",
+    "golf": "G", "hotel": "H", "india": "I", "juliet": "J", "kilo": "K", "lima": "L",
+    "mike": "M", "november": "N", "oscar": "O", "papa": "P", "quebec": "Q", "romeo": "R",
+    "sierra": "S", "tango": "T", "uniform": "U", "victor": "V", "whiskey": "W", "xray": "X",
+    "yankee": "Y", "zulu": "Z",
+}
+FILLERS = frozenset({"um", "uh", "er", "ah", "like", "so", "well"})
+DATE_NOISE = frozenset({"the", "of", "and", "on", "born", "its", "it", "is", "was", "i", "my", "birthday"})
+NAME_PREFIXES = (
+    ("my", "name", "is"), ("my", "first", "name", "is"), ("my", "last", "name", "is"),
+    ("name", "is"), ("it", "is"), ("its",), ("this", "is"), ("i", "am"), ("im",),
+)
+
+# Every word the member-ID normalizer knows how to turn into characters
+MEMBER_ID_WORDS = frozenset(UNITS) | frozenset(TEENS) | frozenset(TENS) | frozenset(REPEATS)
+# "one hundred twenty" could be 120 or 10020; a member ID is read back digit by digit instead
+MEMBER_ID_MULTIPLIERS = frozenset({"hundred", "thousand"})
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_DATE_TOKEN = re.compile(r"[a-z0-9/-]+")
+_NAME_TOKEN = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+_SPELLED_WITH_DASHES = re.compile(r"^[a-z](?:-[a-z])+$")
+_ORDINAL_DIGITS = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)?$")
+_MDY = re.compile(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{2}|\d{4})$")
+_YMD = re.compile(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$")
+_COMPACT = re.compile(r"^(\d{2})(\d{2})(\d{4})$")
+_COMPACT_YMD = re.compile(r"^(\d{4})(\d{2})(\d{2})$")
+
+
+# ---------------------------------------------------------------------------
+# Number words
+# ---------------------------------------------------------------------------
+
+def _parse_small(tokens: Sequence[str]) -> Optional[int]:
+    """0-99 from digits or words: 'seven', 'oh five', 'twenty one', '42'"""
+    if len(tokens) == 1:
+        t = tokens[0]
+        if t.isdigit() and len(t) <= 2:
+            return int(t)
+        if t in UNITS:
+            return UNITS[t]
+        if t in TEENS:
+            return TEENS[t]
+        return TENS.get(t)
+    if len(tokens) == 2:
+        first, second = tokens
+        if first == "oh" and second in UNITS and UNITS[second] > 0:
+            return UNITS[second]
+        if first in TENS and second in UNITS and UNITS[second] > 0:
+            return TENS[first] + UNITS[second]
+    return None
+
+
+def _parse_day(tokens: Sequence[str]) -> Optional[int]:
+    """1-31 from '3', '3rd', 'third', 'three', 'twenty first', 'twenty one'"""
+    day = None
+    if len(tokens) == 1:
+        t = tokens[0]
+        match = _ORDINAL_DIGITS.match(t)
+        if match:
+            day = int(match.group(1))
+        elif t in ORDINALS:
+            day = ORDINALS[t]
+        else:
+            day = _parse_small(tokens)
+    elif len(tokens) == 2 and tokens[0] in TENS and tokens[1] in ORDINALS and ORDINALS[tokens[1]] < 10:
+        day = TENS[tokens[0]] + ORDINALS[tokens[1]]
+    else:
+        day = _parse_small(tokens)
+    return day if day is not None and 1 <= day <= 31 else None
+
+
+def _expand_two_digit_year(year: int) -> int:
+    current = datetime.date.today().year % 100
+    return 2000 + year if year <= current else 1900 + year
+
+
+def _parse_year(tokens: Sequence[str]) -> Optional[int]:
+    """'1980', '80', 'nineteen eighty', 'nineteen oh five', 'two thousand four', 'twenty ten'"""
+    if not tokens:
+        return None
+    if len(tokens) == 1 and tokens[0].isdigit():
+        t = tokens[0]
+        if len(t) == 4:
+            return int(t)
+        if len(t) == 2:
+            return _expand_two_digit_year(int(t))
+        return None
+    if len(tokens) == 2 and tokens[0] in TENS:
+        # "eighty four" is a year with no century, not 8004
+        whole = _parse_small(tokens)
+        if whole is not None:
+            return _expand_two_digit_year(whole)
+    if len(tokens) >= 2 and tokens[1] == "thousand" and tokens[0] in ("one", "two"):
+        rest = tokens[2:]
+        remainder = _parse_small(rest) if rest else 0
+        return None if remainder is None else UNITS[tokens[0]] * 1000 + remainder
+    century = _parse_small(tokens[:1])
+    if century is None or century < 10:
+        return None
+    rest = tokens[1:]
+    if rest == ["hundred"]:
+        return century * 100
+    remainder = _parse_small(rest)
+    if remainder is None:
+        # Two-word year like "eighty four" with no century
+        whole = _parse_small(tokens)
+        return None if whole is None else _expand_two_digit_year(whole)
+    return century * 100 + remainder
+
+
+def _valid_date(year: Optional[int], month: Optional[int], day: Optional[int]) -> Optional[str]:
+    if year is None or month is None or day is None:
+        return None
+    if not 1900 <= year <= datetime.date.today().year:
+        return None
+    try:
+        return datetime.date(year, month, day).strftime("%Y%m%d")
+    except ValueError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Public normalizers
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=4096)
+def normalize_date(text: str) -> Optional[str]:
+    """
+    Spoken or written date of birth -> "YYYYMMDD", or None if it can't be read.
+
+    Handles "04/04/2004", "04 04 2004", "2004-04-04", "04042004", "20040404",
+    "April 4th, 2004", "march third nineteen eighty", "march third eighty four",
+    "the twenty first of june two thousand and four".
+    Numeric dates are read month first, unless they start with a four-digit year.
+    """
+    tokens = [t for t in _DATE_TOKEN.findall(text.lower()) if t not in DATE_NOISE and t not in FILLERS]
+    if not tokens:
+        return None
+    if len(tokens) == 3 and all(t.isdigit() for t in tokens):
+        # "12 12 1990"
+        tokens = ["/".join(tokens)]
+
+    if len(tokens) == 1:
+        t = tokens[0]
+        for pattern, order in ((_MDY, "mdy"), (_YMD, "ymd"), (_COMPACT_YMD, "ymd"), (_COMPACT, "mdy")):
+            match = pattern.match(t)
+            if not match:
+                continue
+            a, b, c = (int(g) for g in match.groups())
+            if order == "ymd":
+                date = _valid_date(a, b, c)
+            else:
+                year = c if len(match.group(3)) == 4 else _expand_two_digit_year(c)
+                date = _valid_date(year, a, b)
+            # Eight digits fit both compact patterns; the other one may still read
+            if date is not None:
+                return date
+        return None
+
+    month_index = next((i for i, t in enumerate(tokens) if t in MONTHS), None)
+    if month_index is None:
+        return None
+    month = MONTHS[tokens[month_index]]
+    before, after = tokens[:month_index], tokens[month_index + 1:]
+
+    if before:
+        # "third of march nineteen eighty"
+        return _valid_date(_parse_year(after), month, _parse_day(before))
+
+    # "march third nineteen eighty": try the longest day that leaves a valid year
+    for split in (2, 1):
+        if len(after) <= split:
+            continue
+        day = _parse_day(after[:split])
+        year = _parse_year(after[split:])
+        if day is not None and year is not None:
+            return _valid_date(year, month, day)
+    return None
+
+
+def _is_plain_word(token: str) -> bool:
+    return len(token) > 1 and token.isalpha() and token not in MEMBER_ID_WORDS and token not in NATO
+
+
+@lru_cache(maxsize=4096)
+def normalize_member_id(text: str) -> Optional[str]:
+    """
+    Spoken insurance/member ID -> compact uppercase ID, or None if it can't be read.
+
+    "aetna one two three" -> "AETNA123", "w double five oh nine" -> "W5509",
+    "triple seven" -> "777", "twenty three" -> "23", "bravo one" -> "B1".
+    A NATO word followed by another word is part of a name ("delta dental one
+    two" -> "DELTADENTAL12"), and IDs spoken with hundred/thousand are None.
+    """
+    tokens = [t for t in _TOKEN.findall(text.lower()) if t not in FILLERS]
+    if any(t in MEMBER_ID_MULTIPLIERS for t in tokens):
+        return None
+    pieces: List[str] = []
+    repeat = 1
+    i = 0
+    while i < len(tokens):
+        t = tokens[i]
+        i += 1
+        if t in REPEATS:
+            repeat = REPEATS[t]
+            continue
+        if t in TENS:
+            if i < len(tokens) and tokens[i] in UNITS and UNITS[tokens[i]] > 0 and tokens[i] != "oh":
+                piece = str(TENS[t] + UNITS[tokens[i]])
+                i += 1
+            else:
+                piece = str(TENS[t])
+        elif t in UNITS:
+            piece = str(UNITS[t])
+        elif t in TEENS:
+            piece = str(TEENS[t])
+        elif t in NATO and not (i < len(tokens) and _is_plain_word(tokens[i])):
+            piece = NATO[t]
+        else:
+            piece = t
+        pieces.append(piece * repeat)
+        repeat = 1
+    return "".join(pieces).upper()
+
+
+def _capitalize_name(word: str) -> str:
+    # "o'brien" -> "O'Brien", "mary-jane" -> "Mary-Jane"
+    return re.sub(r"(^|['-])([a-z])", lambda m: m.group(1) + m.group(2).upper(), word)
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(text: str) -> str:
+    """
+    Spoken name -> capitalized name.
+
+    Strips lead-ins like "my name is", joins spelled letters ("j o h n", "j-o-h-n" -> "John")
+    and capitalizes each part ("o'brien" -> "O'Brien").
+    """
+    tokens = [t for t in _NAME_TOKEN.findall(text.lower()) if t not in FILLERS]
+    for prefix in NAME_PREFIXES:
+        if tuple(tokens[:len(prefix)]) == prefix and len(tokens) > len(prefix):
+            tokens = tokens[len(prefix):]
+            break
+    if len(tokens) > 1 and all(len(t) == 1 for t in tokens):
+        tokens = ["".join(tokens)]
+    elif len(tokens) == 1 and _SPELLED_WITH_DASHES.match(tokens[0]):
+        tokens = [tokens[0].replace("-", "")]
+    return " ".join(_capitalize_name(t) for t in tokens)
+
+
+NORMALIZERS: Dict[str, Callable[[str], Optional[str]]] = {
+    "date_of_birth": normalize_date,
+    "insurance_id": normalize_member_id,
+    "first_name": normalize_name,
+    "last_name": normalize_name,
+}
+
+
+def normalize_batch(kind: str, values: Iterable[str]) -> List[Optional[str]]:
+    """Normalize many values of one kind ("date_of_birth", "insurance_id", "first_name", "last_name")"""
+    normalizer = NORMALIZERS[kind]
+    return [normalizer(value) for value in values]
@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from utils.validate_insuance import DEFAULT_TRADING_PARTNER_ID
+
+logger = logging.getLogger(__name__)
+
+PAYER_INDEX_FILE = os.getenv("PAYER_INDEX_FILE") or str(Path(__file__).parent / "payers.json")
+
+# Anything may follow a spoken payer name, e.g. "AETNA12345"
+_ANY_ID = re.compile(r"[A-Z0-9]*")
+_NOT_ID_CHARS = re.compile(r"[^A-Z0-9]")
+
+
+@dataclass
+class _TrieNode:
+    children: Dict[str, "_TrieNode"] = field(default_factory=dict)
+    # (trading partner id, pattern the rest of the ID has to match)
+    routes: List[Tuple[str, Pattern[str]]] = field(default_factory=list)
+
+
+def compact_id(value: str) -> str:
+    """Uppercase with spaces and punctuation removed, the form the index is keyed on"""
+    return _NOT_ID_CHARS.sub("", value.upper())
+
+
+class PayerIndex:
+    """
+    Routes a member ID to candidate Stedi trading partner IDs.
+
+    Payer names and literal member-ID prefixes ("W" for Aetna, "H" for Humana)
+    are stored in a character trie; each trie node holds the precompiled shape
+    the rest of the ID has to match. A lookup is a single walk down the trie,
+    so cost depends on the ID length, not on how many payers are loaded.
+    """
+    def __init__(self, payers: List[Dict]) -> None:
+        self._root = _TrieNode()
+        self.names: Dict[str, str] = {}
+        for payer in payers:
+            partner_id = payer["trading_partner_id"]
+            self.names[partner_id] = payer["name"]
+            for alias in payer.get("aliases", []):
+                self._insert(compact_id(alias), partner_id, _ANY_ID)
+            for member_id in payer.get("member_ids", []):
+                self._insert(compact_id(member_id["prefix"]), partner_id, re.compile(member_id["shape"]))
+
+    @classmethod
+    def from_file(cls, path: str = PAYER_INDEX_FILE) -> "PayerIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _insert(self, prefix: str, partner_id: str, shape: Pattern[str]) -> None:
+        node = self._root
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+        node.routes.append((partner_id, shape))
+
+    def candidates(self, member_id: str) -> List[str]:
+        """Trading partner IDs whose name or ID shape matches, most specific (longest prefix) first"""
+        key = compact_id(member_id)
+        matches: List[str] = []
+        node: Optional[_TrieNode] = self._root
+        depth = 0
+        while node is not None:
+            rest = key[depth:]
+            for partner_id, shape in node.routes:
+                if shape.fullmatch(rest) and partner_id not in matches:
+                    matches.append(partner_id)
+            if depth == len(key):
+                break
+            node = node.children.get(key[depth])
+            depth += 1
+        matches.reverse()
+        return matches
+
+    def route(self, member_id: str, attempt: int = 0) -> str:
+        """
+        Trading partner ID for the given attempt. Retries move on to the next
+        candidate, and fall back to the default payer once the list runs out.
+        """
+        candidates = self.candidates(member_id)
+        if DEFAULT_TRADING_PARTNER_ID not in candidates:
+            candidates.append(DEFAULT_TRADING_PARTNER_ID)
+        return candidates[min(attempt, len(candidates) - 1)]
+
+
+_payer_index: Optional[PayerIndex] = None
+
+
+def get_payer_index() -> PayerIndex:
+    """Return the process-wide payer index, loading it on first use"""
+    global _payer_index
+    if _payer_index is None:
+        _payer_index = PayerIndex.from_file()
+        logger.info(f"Loaded {len(_payer_index.names)} payers from {PAYER_INDEX_FILE}")
+    return _payer_index
+
+
+def route_trading_partner(member_id: str, attempt: int = 0) -> str:
+    return get_payer_index().route(member_id, attempt)
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+import aiohttp
+from livekit.agents import APIConnectOptions, JobProcess
+from livekit.agents.llm import LLM, ChatContext
+from livekit.agents.stt import STT
+from livekit.agents.tts import TTS
+from livekit.agents.vad import VAD
+from livekit.plugins import deepgram, openai, elevenlabs, silero
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "gpt-4o-mini"
+LLM_TIMEOUT = 29.0
+TTS_VOICE_ID = "ODq5zmih8GrVes37Dizd"
+TTS_MODEL = "eleven_multilingual_v2"
+# Hosts the STT and TTS websockets connect to, warmed at job start
+DEEPGRAM_URL = "https://api.deepgram.com"
+ELEVENLABS_URL = "https://api.elevenlabs.io"
+
+# Endpointing, tune with benchmarks/bench_vad_replay.py
+VAD_OPTIONS = {
+    "activation_threshold": float(os.getenv("VAD_ACTIVATION_THRESHOLD") or "0.5"),
+    "min_silence_duration": float(os.getenv("VAD_MIN_SILENCE_DURATION") or "0.55"),
+    "min_speech_duration": float(os.getenv("VAD_MIN_SPEECH_DURATION") or "0.05"),
+}
+# AgentSession waits this long after end-of-speech before committing the turn
+MIN_ENDPOINTING_DELAY = float(os.getenv("MIN_ENDPOINTING_DELAY") or "0.5")
+
+
+async def _close_stale_session(session: aiohttp.ClientSession) -> None:
+    try:
+        await session.close()
+    except RuntimeError as e:
+        # Its pooled connections belonged to an event loop that is already closed
+        logger.debug(f"Could not close the previous HTTP session cleanly: {e}")
+
+
+class ProviderPool:
+    """
+    Worker-level pool of STT/LLM/TTS/VAD instances.
+
+    Every agent node in a session (and every session in the same process) shares
+    the same provider clients instead of building new ones on each transition.
+    The Silero model is loaded once, ideally from the worker prewarm hook.
+    """
+
+    def __init__(self, vad_model: Optional[VAD] = None) -> None:
+        self._vad = vad_model
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._closing: Optional[asyncio.Task] = None
+        self._stt: Optional[STT] = None
+        self._llm: Optional[LLM] = None
+        self._tts: Optional[TTS] = None
+
+    def _bind_loop(self) -> None:
+        # The plugin clients hold loop-bound HTTP sessions, so rebuild them if the
+        # pool is used from a new event loop (e.g. a new job in the same process).
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        if self._http_session is not None and not self._http_session.closed:
+            self._closing = loop.create_task(_close_stale_session(self._http_session))
+        self._loop = loop
+        self._http_session = aiohttp.ClientSession()
+        self._stt = None
+        self._llm = None
+        self._tts = None
+
+    @property
+    def http_session(self) -> aiohttp.ClientSession:
+        self._bind_loop()
+        return self._http_session
+
+    @property
+    def vad(self) -> VAD:
+        if self._vad is None:
+            logger.warning("VAD was not prewarmed, loading it on first use")
+            self._vad = silero.VAD.load(**VAD_OPTIONS)
+        return self._vad
+
+    @property
+    def stt(self) -> STT:
+        self._bind_loop()
+        if self._stt is None:
+            self._stt = deepgram.STT(http_session=self._http_session)
+        return self._stt
+
+    @property
+    def llm(self) -> LLM:
+        self._bind_loop()
+        if self._llm is None:
+            self._llm = openai.LLM(model=LLM_MODEL, timeout=LLM_TIMEOUT)
+        return self._llm
+
+    @property
+    def tts(self) -> TTS:
+        self._bind_loop()
+        if self._tts is None:
+            self._tts = elevenlabs.TTS(
+                voice_id=TTS_VOICE_ID,
+                model=TTS_MODEL,
+                http_session=self._http_session)
+        return self._tts
+
+    async def _open_connection(self, url: str) -> None:
+        # Any response will do: it leaves a kept-alive TLS connection in the shared
+        # session, which the plugin's websocket upgrade then reuses
+        async with self.http_session.head(url) as response:
+            await response.read()
+
+    async def warm_stt(self) -> None:
+        """Open a connection for the first Deepgram stream"""
+        await self._open_connection(DEEPGRAM_URL)
+
+    async def warm_tts(self) -> None:
+        """Open a connection for the first ElevenLabs stream"""
+        await self._open_connection(ELEVENLABS_URL)
+
+    async def warm_llm(self) -> None:
+        """Check the OpenAI key and model with a one-token completion, leaving a connection in the LLM's own HTTP client"""
+        chat_ctx = ChatContext.empty()
+        chat_ctx.add_message(role="user", content="Hi")
+        # No retries: a failed warmup is reported by Startup and the call's own turns still retry
+        async with self.llm.chat(
+            chat_ctx=chat_ctx,
+            conn_options=APIConnectOptions(max_retry=0, timeout=LLM_TIMEOUT),
+            extra_kwargs={"max_completion_tokens": 1},
+        ) as stream:
+            async for _ in stream:
+                pass
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP session and LLM client. JobContext shutdown callback; the next job rebuilds them."""
+        if self._llm is not None:
+            await self._llm.aclose()
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._loop = None
+        self._http_session = None
+        self._stt = None
+        self._llm = None
+        self._tts = None
+
+
+_pool: Optional[ProviderPool] = None
+
+
+def get_provider_pool() -> ProviderPool:
+    """Return the process-wide provider pool, creating it if prewarm did not run."""
+    global _pool
+    if _pool is None:
+        _pool = ProviderPool()
+    return _pool
+
+
+def set_provider_pool(pool: ProviderPool) -> None:
+    """Replace the process-wide pool, e.g. with fake providers for offline simulation."""
+    global _pool
+    _pool = pool
+
+
+def prewarm(proc: JobProcess) -> None:
+    """WorkerOptions.prewarm_fnc: load the VAD model once per worker process."""
+    global _pool
+    _pool = ProviderPool(vad_model=silero.VAD.load(**VAD_OPTIONS))
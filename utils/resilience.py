@@ -0,0 +1,409 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, TypeVar
+
+from livekit.agents import APIConnectOptions, metrics
+from livekit.agents.llm import LLM
+from livekit.agents.stt import STT
+from livekit.agents.tts import TTS
+from livekit.agents.voice import AgentSession, MetricsCollectedEvent
+from livekit.agents.voice.events import ErrorEvent
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Dependency names
+STEDI = "stedi"
+STT_PROVIDER = "stt"
+LLM_PROVIDER = "llm"
+TTS_PROVIDER = "tts"
+PROVIDERS = (STT_PROVIDER, LLM_PROVIDER, TTS_PROVIDER)
+
+# livekit runs every call in its own process; breaker state and latency samples live
+# here so a circuit opened by one call fails fast for the next, and hedging learns across calls
+RESILIENCE_DIR = os.getenv("RESILIENCE_DIR") or os.path.join(tempfile.gettempdir(), "voice_agent_resilience")
+LATENCY_SAMPLES = 500
+# How often each process merges its breaker and latency changes into RESILIENCE_DIR, in seconds
+SYNC_INTERVAL = float(os.getenv("RESILIENCE_SYNC_INTERVAL") or "0.5")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+    def __init__(self, name: str) -> None:
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How one dependency is called: per-attempt timeout, jittered backoff and hedging"""
+    timeout: float
+    max_attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+    # Send a duplicate request once an attempt runs past the observed p95
+    hedge: bool = False
+    hedge_min_samples: int = 20
+    # Circuit breaker
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def _policy_from_env(prefix: str, default: RetryPolicy) -> RetryPolicy:
+    # e.g. STEDI_ATTEMPT_TIMEOUT=5 STEDI_MAX_ATTEMPTS=2
+    return RetryPolicy(
+        timeout=float(os.getenv(f"{prefix}_ATTEMPT_TIMEOUT") or default.timeout),
+        max_attempts=int(os.getenv(f"{prefix}_MAX_ATTEMPTS") or default.max_attempts),
+        base_delay=default.base_delay,
+        max_delay=default.max_delay,
+        hedge=default.hedge,
+        hedge_min_samples=default.hedge_min_samples,
+        failure_threshold=int(os.getenv(f"{prefix}_BREAKER_THRESHOLD") or default.failure_threshold),
+        reset_timeout=float(os.getenv(f"{prefix}_BREAKER_RESET") or default.reset_timeout),
+    )
+
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    STEDI: _policy_from_env("STEDI", RetryPolicy(timeout=8.0, max_attempts=3, base_delay=0.5, hedge=True)),
+    STT_PROVIDER: _policy_from_env("STT", RetryPolicy(timeout=10.0)),
+    LLM_PROVIDER: _policy_from_env("LLM", RetryPolicy(timeout=15.0)),
+    TTS_PROVIDER: _policy_from_env("TTS", RetryPolicy(timeout=10.0)),
+}
+
+
+def _initial_state() -> Dict[str, Any]:
+    return {"failures": 0, "opened_at": None, "trial_started_at": None, "latencies": []}
+
+
+class SharedState:
+    """
+    One dependency's breaker counters and latency samples, shared through a
+    JSON file by every job process on the host (in this process only when
+    `path` is None).
+
+    read() and update() only touch memory, so nothing on the call's event loop
+    waits on disk or on another process's lock. update() applies the change
+    locally and queues it; a background thread replays queued changes onto
+    the file under an exclusive flock every SYNC_INTERVAL seconds (straight
+    away for urgent ones, e.g. a breaker opening) and picks up what other
+    processes wrote. Times are wall clock, the only clock the processes share.
+    """
+    def __init__(self, path: Optional[Path], sync_interval: float = SYNC_INTERVAL) -> None:
+        self.path = path
+        self.sync_interval = sync_interval
+        self._data = _initial_state()
+        self._pending: List[Callable[[Dict[str, Any]], Any]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._mtime: Optional[int] = None
+        if self.path is not None:
+            # Load what other processes already know right away
+            self._wake.set()
+            threading.Thread(target=self._sync_forever, daemon=True, name=f"resilience-{self.path.stem}").start()
+
+    def read(self) -> Dict[str, Any]:
+        return self._data
+
+    def update(self, change: Callable[[Dict[str, Any]], Any], urgent: bool = True) -> Any:
+        """Apply change(state) here now and to the shared file soon; return what it returns here"""
+        with self._lock:
+            data = dict(self._data)
+            result = change(data)
+            self._data = data
+            if self.path is not None:
+                self._pending.append(change)
+        if urgent:
+            self._wake.set()
+        return result
+
+    def _sync_forever(self) -> None:
+        while True:
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not sync {self.path}: {e}")
+
+    def sync(self) -> None:
+        """Write queued changes to the file and load other processes' changes. Blocking."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            data = self._sync_file(pending)
+        except BaseException:
+            with self._lock:
+                self._pending[:0] = pending
+            raise
+        if data is None:
+            return
+        with self._lock:
+            # Changes made while the file was being written are still local only
+            for change in self._pending:
+                change(data)
+            self._data = data
+
+    def _sync_file(self, pending: List[Callable[[Dict[str, Any]], Any]]) -> Optional[Dict[str, Any]]:
+        # None when neither this process nor another one changed anything
+        if not pending:
+            try:
+                if self.path.stat().st_mtime_ns == self._mtime:
+                    return None
+            except FileNotFoundError:
+                return None
+            # Files are replaced whole, so reading needs no lock
+            return {**_initial_state(), **self._load()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            data = {**_initial_state(), **self._load()}
+            for change in pending:
+                change(data)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(data))
+            os.replace(tmp_path, self.path)
+            self._mtime = self.path.stat().st_mtime_ns
+        return data
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable {self.path}: {e}")
+            return {}
+        self._mtime = mtime
+        return data
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures. Once
+    `reset_timeout` has passed a single trial call is let through (half-open);
+    its outcome closes the circuit again or restarts the timer. A trial that
+    never reports back (its process died) is given up after `reset_timeout`.
+    The trial is claimed in memory, so processes syncing within the same
+    interval may each let one through.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float, shared: Optional[SharedState] = None) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.shared = shared or SharedState(None)
+
+    @property
+    def failures(self) -> int:
+        return self.shared.read()["failures"]
+
+    @property
+    def state(self) -> str:
+        opened_at = self.shared.read()["opened_at"]
+        if opened_at is None:
+            return "closed"
+        if time.time() - opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+
+        def take_trial(data: Dict[str, Any]) -> bool:
+            now = time.time()
+            trial_started_at = data["trial_started_at"]
+            if trial_started_at is not None and now - trial_started_at < self.reset_timeout:
+                return False
+            data["trial_started_at"] = now
+            return True
+        return self.shared.update(take_trial)
+
+    def release_trial(self) -> None:
+        """Give the half-open trial back without an outcome, e.g. when the call was cancelled"""
+        if self.shared.read()["trial_started_at"] is not None:
+            self.shared.update(lambda data: data.update(trial_started_at=None))
+
+    def record_success(self) -> None:
+        data = self.shared.read()
+        if data["failures"] or data["opened_at"] is not None or data["trial_started_at"] is not None:
+            self.shared.update(lambda data: data.update(failures=0, opened_at=None, trial_started_at=None))
+
+    def record_failure(self) -> None:
+        def fail(data: Dict[str, Any]) -> bool:
+            data["failures"] += 1
+            data["trial_started_at"] = None
+            if data["opened_at"] is not None or data["failures"] >= self.failure_threshold:
+                opened = data["opened_at"] is None
+                data["opened_at"] = time.time()
+                return opened
+            return False
+        if self.shared.update(fail):
+            logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+
+
+class Dependency:
+    """
+    An external service called through a RetryPolicy and a CircuitBreaker.
+    Breaker state and latency samples are kept in `state_dir`, shared with the
+    worker's other job processes; None keeps them in this process only.
+    """
+    def __init__(self, name: str, policy: RetryPolicy, state_dir: Optional[str] = RESILIENCE_DIR) -> None:
+        self.name = name
+        self.policy = policy
+        self.shared = SharedState(Path(state_dir) / f"{name}.json" if state_dir else None)
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout, self.shared)
+        self.hedges = 0
+
+    def observe(self, seconds: float) -> None:
+        def add(data: Dict[str, Any]) -> None:
+            data["latencies"] = (data["latencies"] + [round(seconds, 4)])[-LATENCY_SAMPLES:]
+        # Batched into the next periodic sync instead of a file write per request
+        self.shared.update(add, urgent=False)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        latencies = self.shared.read()["latencies"]
+        if len(latencies) < self.policy.hedge_min_samples:
+            return None
+        samples = sorted(latencies)
+        return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+    def conn_options(self) -> APIConnectOptions:
+        """Per-dependency timeout and retries for livekit provider streams, with a jittered retry interval"""
+        return APIConnectOptions(
+            max_retry=max(0, self.policy.max_attempts - 1),
+            retry_interval=self.policy.backoff(2),
+            timeout=self.policy.timeout,
+        )
+
+    async def _attempt(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        is_failure: Callable[[T], bool]
+    ) -> T:
+        started = time.monotonic()
+        deadline = started + self.policy.timeout
+        pending: Set[asyncio.Task] = {asyncio.create_task(fn())}
+        hedge_after = self.percentile(0.95) if self.policy.hedge else None
+        outcome: Optional[asyncio.Task] = None
+        try:
+            if hedge_after is not None and hedge_after < self.policy.timeout:
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    self.hedges += 1
+                    pending.add(asyncio.create_task(fn()))
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outcome = task
+                    if task.exception() is None and not is_failure(task.result()):
+                        self.observe(time.monotonic() - started)
+                        return task.result()
+            # Every request failed, or the attempt ran out of time
+            if outcome is None:
+                raise asyncio.TimeoutError(f"{self.name} did not answer within {self.policy.timeout}s")
+            return outcome.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        is_failure: Callable[[T], bool] = lambda result: False
+    ) -> T:
+        """
+        Call fn() with the policy's timeout, hedging and retries. Returns the first
+        good result, or the last failed one once attempts run out. Raises
+        CircuitOpenError without calling fn() while the circuit is open.
+        """
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.name)
+        attempt = 1
+        try:
+            while True:
+                try:
+                    result = await self._attempt(fn, is_failure)
+                except Exception as e:
+                    if not self._should_retry(attempt):
+                        raise
+                    logger.warning(f"{self.name} attempt {attempt} failed: {e}")
+                else:
+                    if not is_failure(result):
+                        self.breaker.record_success()
+                        return result
+                    if not self._should_retry(attempt):
+                        return result
+                await asyncio.sleep(self.policy.backoff(attempt))
+                attempt += 1
+        finally:
+            if trial:
+                # A cancelled half-open trial (the caller hung up) reported neither outcome
+                self.breaker.release_trial()
+
+    def _should_retry(self, attempt: int) -> bool:
+        """Record a failed attempt; retry unless attempts ran out or the breaker just opened"""
+        self.breaker.record_failure()
+        return attempt < self.policy.max_attempts and self.breaker.state == "closed"
+
+
+_dependencies: Dict[str, Dependency] = {}
+
+
+def get_dependency(name: str) -> Dependency:
+    """Return the process-wide Dependency for a name in DEFAULT_POLICIES"""
+    dependency = _dependencies.get(name)
+    if dependency is None:
+        dependency = _dependencies[name] = Dependency(name, DEFAULT_POLICIES[name])
+    return dependency
+
+
+def provider_conn_options(name: str) -> APIConnectOptions:
+    return get_dependency(name).conn_options()
+
+
+def open_circuits(names: Iterable[str] = PROVIDERS) -> List[str]:
+    """Which of `names` are currently failing fast, on any call on this host"""
+    return [name for name in names if get_dependency(name).breaker.state == "open"]
+
+
+def attach_session_breakers(session: AgentSession) -> None:
+    """Feed provider errors and successful metrics into the STT/LLM/TTS circuit breakers"""
+    @session.on("error")
+    def _on_error(ev: ErrorEvent) -> None:
+        # livekit also emits an event for each attempt it is about to retry; only count given-up requests
+        if getattr(ev.error, "recoverable", False):
+            return
+        for name, kind in ((STT_PROVIDER, STT), (LLM_PROVIDER, LLM), (TTS_PROVIDER, TTS)):
+            if isinstance(ev.source, kind):
+                get_dependency(name).breaker.record_failure()
+
+    @session.on("metrics_collected")
+    def _on_metrics(ev: MetricsCollectedEvent) -> None:
+        m: Any = ev.metrics
+        if isinstance(m, metrics.STTMetrics):
+            get_dependency(STT_PROVIDER).breaker.record_success()
+        elif isinstance(m, metrics.LLMMetrics):
+            get_dependency(LLM_PROVIDER).breaker.record_success()
+        elif isinstance(m, metrics.TTSMetrics):
+            get_dependency(TTS_PROVIDER).breaker.record_success()
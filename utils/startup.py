@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+from utils.latency_metrics import STARTUP, observe
+from utils.log_pipeline import fields
+
+logger = logging.getLogger(__name__)
+
+# Longest a warm-up step may take before it is reported as failed; the call goes on either way
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT") or "5")
+
+
+class Startup:
+    """
+    Runs a job's startup steps (room join, provider and Stedi warm-up) at the
+    same time and times each one.
+
+    start() returns the step's task, so the entrypoint awaits only what it
+    needs (the room) and the rest finishes in the background. Once every step
+    is done the timings are logged together; each also goes to the startup
+    span, labelled by step.
+    """
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.failures: Dict[str, str] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, step: Awaitable[Any], timeout: Optional[float] = WARMUP_TIMEOUT) -> asyncio.Task:
+        """Run `step` in the background, None for no timeout. A step that returns False counts as failed."""
+        task = asyncio.create_task(self._timed(name, step, timeout))
+        task.add_done_callback(self._step_done)
+        self._tasks[name] = task
+        return task
+
+    async def _timed(self, name: str, step: Awaitable[Any], timeout: Optional[float]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(step, timeout)
+            if result is False:
+                self.failures[name] = "rejected"
+            return result
+        except Exception as e:
+            self.failures[name] = type(e).__name__
+            raise
+        finally:
+            self.timings[name] = time.perf_counter() - start
+            observe(STARTUP, name, self.timings[name])
+
+    def _step_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled():
+            # Failures are already recorded; this only marks the exception as retrieved
+            task.exception()
+        if all(t.done() for t in self._tasks.values()):
+            self.report()
+
+    def report(self) -> None:
+        """Log how long each step took"""
+        timings = {f"{name}_ms": round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+        total_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        if self.failures:
+            logger.warning("Startup finished with failures", extra=fields(
+                total_ms=total_ms, failed=self.failures, **timings
+            ))
+        else:
+            logger.info("Startup finished", extra=fields(total_ms=total_ms, **timings))
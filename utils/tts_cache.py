@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import logging
+import os
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+
+from livekit import rtc
+from livekit.agents.tts import TTS
+from livekit.agents.utils.audio import AudioByteStream
+from livekit.agents.voice import AgentSession, SpeechHandle
+
+from utils.providers import TTS_VOICE_ID, TTS_MODEL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv("TTS_CACHE_DIR", ".tts_cache")
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio for fixed prompts.
+
+    Entries are keyed by (voice_id, model, text) and kept in an in-memory LRU
+    backed by WAV files on disk, so a prompt is only sent to the TTS provider
+    once per voice/model no matter how many calls or workers play it.
+    """
+
+    def __init__(
+        self,
+        voice_id: str,
+        model: str,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = 128
+    ) -> None:
+        self.voice_id = voice_id
+        self.model = model
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, rtc.AudioFrame]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._warm_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def key(self, text: str) -> str:
+        raw = f"{self.voice_id}\x00{self.model}\x00{text.strip()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.wav"
+
+    def _remember(self, key: str, frame: rtc.AudioFrame) -> None:
+        self._memory[key] = frame
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[rtc.AudioFrame]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with wave.open(str(path), "rb") as wav:
+                return rtc.AudioFrame(
+                    data=wav.readframes(wav.getnframes()),
+                    sample_rate=wav.getframerate(),
+                    num_channels=wav.getnchannels(),
+                    samples_per_channel=wav.getnframes(),
+                )
+        except (OSError, wave.Error) as e:
+            logger.warning(f"Ignoring unreadable TTS cache entry {path}: {e}")
+            return None
+
+    def _write(self, key: str, frame: rtc.AudioFrame) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path(key).with_suffix(".tmp")
+        with wave.open(str(tmp_path), "wb") as wav:
+            wav.setnchannels(frame.num_channels)
+            wav.setsampwidth(2)
+            wav.setframerate(frame.sample_rate)
+            wav.writeframes(bytes(frame.data))
+        os.replace(tmp_path, self._path(key))
+
+    def get(self, text: str) -> Optional[rtc.AudioFrame]:
+        """Return cached audio from memory only. Never touches disk or the network."""
+        key = self.key(text)
+        frame = self._memory.get(key)
+        if frame is not None:
+            self._memory.move_to_end(key)
+        return frame
+
+    def load(self, texts: Iterable[str]) -> int:
+        """Load on-disk entries for the given prompts into memory. Safe to call from prewarm."""
+        loaded = 0
+        for text in texts:
+            key = self.key(text)
+            if key in self._memory:
+                continue
+            frame = self._read(key)
+            if frame is not None:
+                self._remember(key, frame)
+                loaded += 1
+        return loaded
+
+    async def _synthesize(self, tts: TTS, text: str, key: str) -> rtc.AudioFrame:
+        frame = await tts.synthesize(text).collect()
+        await asyncio.to_thread(self._write, key, frame)
+        self._remember(key, frame)
+        return frame
+
+    async def fetch(self, tts: TTS, text: str) -> rtc.AudioFrame:
+        """Return cached audio, synthesizing and storing it on a miss."""
+        key = self.key(text)
+        frame = self.get(text)
+        if frame is not None:
+            return frame
+        frame = await asyncio.to_thread(self._read, key)
+        if frame is not None:
+            self._remember(key, frame)
+            return frame
+        # Collapse concurrent misses for the same prompt into one TTS request
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._synthesize(tts, text, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def warm(self, tts: TTS, texts: Iterable[str]) -> None:
+        """Make sure every prompt is cached. Runs sequentially to stay under TTS rate limits."""
+        for text in texts:
+            try:
+                await self.fetch(tts, text)
+            except Exception as e:
+                logger.warning(f"Failed to warm TTS cache for {text!r}: {e}")
+
+    def warm_in_background(self, tts: TTS, texts: Iterable[str]) -> None:
+        """Start warm() as a task unless one is already running."""
+        if self._warm_task is None or self._warm_task.done():
+            self._warm_task = asyncio.create_task(self.warm(tts, list(texts)))
+
+    def say(self, session: AgentSession, text: str, **kwargs: Any) -> SpeechHandle:
+        """session.say() that plays cached frames when available, skipping the TTS round trip."""
+        frame = self.get(text)
+        if frame is None:
+            self.misses += 1
+            return session.say(text, **kwargs)
+        self.hits += 1
+        return session.say(text, audio=_replay(frame), **kwargs)
+
+
+async def _replay(frame: rtc.AudioFrame) -> AsyncIterator[rtc.AudioFrame]:
+    # Re-chunk into 100ms frames so playback can be interrupted promptly
+    stream = AudioByteStream(sample_rate=frame.sample_rate, num_channels=frame.num_channels)
+    for chunk in stream.push(bytes(frame.data)):
+        yield chunk
+    for chunk in stream.flush():
+        yield chunk
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> TTSCache:
+    """Return the process-wide cache for the configured ElevenLabs voice and model."""
+    global _cache
+    if _cache is None:
+        _cache = TTSCache(voice_id=TTS_VOICE_ID, model=TTS_MODEL)
+    return _cache
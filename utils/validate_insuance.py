@@ -1,20 +1,125 @@
 import os
 import json
+import asyncio
 import aiohttp
 import logging
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+from utils.eligibility_parser import Eligibility, eligibility_from_response, read_eligibility
+from utils.log_pipeline import fields, redact
+from utils.resilience import STEDI, CircuitOpenError, get_dependency
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+STEDI_MAX_CONNECTIONS = int(os.getenv("STEDI_MAX_CONNECTIONS", "100"))
+STEDI_MAX_CONNECTIONS_PER_HOST = int(os.getenv("STEDI_MAX_CONNECTIONS_PER_HOST", "20"))
+STEDI_KEEPALIVE_SECONDS = 30.0
+STEDI_TIMEOUT_SECONDS = 30.0
+DEFAULT_TRADING_PARTNER_ID = "60054"
+STEDI_PROVIDER_NAME = os.getenv("STEDI_PROVIDER_NAME") or "Provider Name"
+STEDI_PROVIDER_NPI = os.getenv("STEDI_PROVIDER_NPI") or "1999999984"
+DEFAULT_STEDI_API_URL = "https://healthcare.us.stedi.com/2024-04-01/change/medicalnetwork/eligibility/v3"
+# Cheap authenticated request used to check the key at job start; no eligibility check is made
+DEFAULT_STEDI_HEALTH_URL = "https://healthcare.us.stedi.com/2024-04-01/payers/search?query=aetna&pageSize=1"
+
+
+class StediHTTPClient:
+    """
+    Long-lived aiohttp session for Stedi calls.
+
+    Keeps connections alive between eligibility checks so only the first request
+    pays for DNS/TCP/TLS setup, and caps how many sockets can be open at once.
+    """
+    def __init__(
+        self,
+        limit: int = STEDI_MAX_CONNECTIONS,
+        limit_per_host: int = STEDI_MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout: float = STEDI_KEEPALIVE_SECONDS,
+        timeout: float = STEDI_TIMEOUT_SECONDS
+    ) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_stedi_client: Optional[StediHTTPClient] = None
+
+
+def get_stedi_client() -> StediHTTPClient:
+    """Return the worker's shared Stedi client"""
+    global _stedi_client
+    if _stedi_client is None:
+        _stedi_client = StediHTTPClient()
+    return _stedi_client
+
+
+async def close_stedi_client() -> None:
+    """Close the shared Stedi client. Registered as a job shutdown callback."""
+    if _stedi_client is not None:
+        await _stedi_client.aclose()
+
+
+async def verify_stedi(session: Optional[aiohttp.ClientSession] = None) -> bool:
+    """
+    Check that STEDI_API_KEY is set and accepted, leaving a kept-alive
+    connection for the first eligibility request. Returns False for a missing
+    key or any non-2xx answer; connection errors are raised.
+
+    With STEDI_API_URL pointing at a stand-in, the check is skipped unless
+    STEDI_HEALTH_URL points at the stand-in's health endpoint too.
+    """
+    api_key = os.getenv("STEDI_API_KEY")
+    if not api_key:
+        logger.error("Missing STEDI_API_KEY in .env")
+        return False
+    url = os.getenv("STEDI_HEALTH_URL")
+    if not url:
+        if os.getenv("STEDI_API_URL"):
+            logger.info("STEDI_API_URL is set without STEDI_HEALTH_URL, skipping the Stedi check")
+            return True
+        url = DEFAULT_STEDI_HEALTH_URL
+    session = session or get_stedi_client().session
+    async with session.get(url, headers={"Authorization": f"Key {api_key}"}) as response:
+        await response.read()
+    if not 200 <= response.status < 300:
+        logger.error("Stedi health check failed", extra=fields(status=response.status, url=url))
+        return False
+    return True
+
+
 async def check_insurance_eligibility(
     first_name: str, 
     last_name: str, 
     insurance_id: str, 
     date_of_birth: str,
-    retry_count: int = 0
+    retry_count: int = 0,
+    session: Optional[aiohttp.ClientSession] = None,
+    trading_partner_id: str = DEFAULT_TRADING_PARTNER_ID
 ) -> Dict[str, Any]:
     """
     Make a call to the Stedi API to check insurance eligibility.
@@ -25,17 +130,19 @@ async def check_insurance_eligibility(
         insurance_id: Patient's insurance ID
         date_of_birth: Patient's date of birth (YYYYMMDD format)
         retry_count: Current retry attempt count
+        session: HTTP session to use, defaults to the shared pooled client
+        trading_partner_id: Stedi payer ID, see utils/payer_index.py
         
     Returns:
-        Dictionary containing the API response or error information
+        {"success": True, "eligibility": Eligibility.as_dict()} or error information
     """
     try:
         payload = {
             "controlNumber": "112233445",
-            "tradingPartnerServiceId": "60054",  # Note: Changed this to match your curl example
+            "tradingPartnerServiceId": trading_partner_id,
             "provider": {
-                "organizationName": "Provider Name",
-                "npi": "1999999984"
+                "organizationName": STEDI_PROVIDER_NAME,
+                "npi": STEDI_PROVIDER_NPI
             },
             "subscriber": {
                 "firstName": first_name,
@@ -57,46 +164,65 @@ async def check_insurance_eligibility(
                 "message": "System configuration error. Check .env and try again later."
             }
         
-        stedi_api_url = 'https://healthcare.us.stedi.com/2024-04-01/change/medicalnetwork/eligibility/v3'
+        # Override with STEDI_API_URL to point at a local stand-in (see benchmarks/mock_stedi.py)
+        stedi_api_url = os.getenv("STEDI_API_URL") or DEFAULT_STEDI_API_URL
 
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Key {api_key}"
         }
         
-        logger.info(f"Sending request to Stedi API for patient {first_name} {last_name}")
+        logger.info("stedi_request", extra=fields(
+            trading_partner_id=trading_partner_id, first_name=first_name, last_name=last_name, member_id=insurance_id
+        ))
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(stedi_api_url, json=payload, headers=headers) as response:
-                response_text = await response.text()
-
+        session = session or get_stedi_client().session
+        async with session.post(stedi_api_url, json=payload, headers=headers) as response:
+            if response.status != 200:
                 try:
-                    response_data = json.loads(response_text)
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse JSON response: {response_text}")
+                    response_data = await response.json(content_type=None)
+                except (json.JSONDecodeError, aiohttp.ContentTypeError):
+                    response_data = None
+                if response_data is None:
+                    logger.error("Failed to parse Stedi response", extra=fields(status=response.status))
                     return {
                         "success": False,
                         "error_type": "json_error",
                         "status_code": response.status,
                         "message": "Failed to parse API response"
                     }
-                
-                if response.status != 200:
-                    logger.error(f"Stedi API error: Status {response.status}, {response_text}")
-                    return {
-                        "success": False,
-                        "error_type": "api_error",
-                        "status_code": response.status,
-                        "message": f"API error: {response_data.get('message', response_text)}"
-                    }
-                
+                # Only the error details; the body echoes the subscriber back
+                logger.error("Stedi API error", extra=fields(
+                    status=response.status,
+                    message=response_data.get("message"),
+                    errors=redact(response_data.get("errors")),
+                ))
+                return {
+                    "success": False,
+                    "error_type": "api_error",
+                    "status_code": response.status,
+                    "message": f"API error: {response_data.get('message', response.reason)}"
+                }
+
+            # Parsed while it downloads; large plans list hundreds of benefits we never look at
+            try:
+                eligibility = await read_eligibility(response.content.iter_any())
+            except ValueError:
+                logger.error("Failed to parse Stedi response", extra=fields(status=response.status))
                 return {
-                    "success": True,
-                    "data": response_data
+                    "success": False,
+                    "error_type": "json_error",
+                    "status_code": response.status,
+                    "message": "Failed to parse API response"
                 }
+            
+            return {
+                "success": True,
+                "eligibility": eligibility.as_dict()
+            }
                 
     except Exception as e:
-        logger.error(f"Error checking eligibility: {str(e)}")
+        logger.error("Error checking eligibility", extra=fields(error=str(e)))
         return {
             "success": False,
             "error_type": "exception",
@@ -105,7 +231,66 @@ async def check_insurance_eligibility(
 
 
 
+def is_retryable_failure(result: Dict[str, Any]) -> bool:
+    """Failed checks worth retrying: transport errors, unreadable bodies, throttling and 5xx"""
+    if result.get("success"):
+        return False
+    if result.get("error_type") == "api_error":
+        status = result.get("status_code", 0)
+        return status == 429 or status >= 500
+    return result.get("error_type") in ("exception", "json_error")
+
+
+async def resilient_check_insurance_eligibility(
+    first_name: str,
+    last_name: str,
+    insurance_id: str,
+    date_of_birth: str,
+    retry_count: int = 0,
+    trading_partner_id: str = DEFAULT_TRADING_PARTNER_ID
+) -> Dict[str, Any]:
+    """
+    check_insurance_eligibility() with the Stedi retry policy: per-attempt timeout,
+    jittered backoff, a hedged duplicate request past the p95, and a circuit breaker.
+
+    Returns the same dictionary shape, with error_type "circuit_open" while Stedi is
+    failing fast and "timeout" when every attempt ran out of time.
+    """
+    try:
+        return await get_dependency(STEDI).call(
+            lambda: check_insurance_eligibility(
+                first_name=first_name,
+                last_name=last_name,
+                insurance_id=insurance_id,
+                date_of_birth=date_of_birth,
+                retry_count=retry_count,
+                trading_partner_id=trading_partner_id
+            ),
+            is_failure=is_retryable_failure
+        )
+    except CircuitOpenError as e:
+        logger.error(f"Skipping eligibility check: {e}")
+        return {
+            "success": False,
+            "error_type": "circuit_open",
+            "message": str(e)
+        }
+    except asyncio.TimeoutError as e:
+        logger.error(f"Eligibility check timed out: {e}")
+        return {
+            "success": False,
+            "error_type": "timeout",
+            "message": str(e)
+        }
+
+
+
 def validate_insurance_eligibility(response_data, retry_count=0):
+    """Validate a decoded Stedi response body, see validate_eligibility()"""
+    return validate_eligibility(eligibility_from_response(response_data), retry_count)
+
+
+def validate_eligibility(eligibility: Eligibility, retry_count: int = 0) -> Dict[str, Any]:
     result = {
         "is_valid": True,
         "active_insurance": False,
@@ -118,7 +303,7 @@ def validate_insurance_eligibility(response_data, retry_count=0):
     }
     
     # Option 1: Check if response is valid
-    if "subscriber" not in response_data or not response_data["subscriber"]:
+    if not eligibility.has_subscriber:
         result["is_valid"] = False
         if retry_count <= 1:
             result["message"] = "I'm having trouble verifying your insurance."
@@ -128,7 +313,7 @@ def validate_insurance_eligibility(response_data, retry_count=0):
             result["needs_representative"] = True
         return result
     
-    if "planStatus" not in response_data or not response_data["planStatus"]:
+    if not eligibility.has_plan_status:
         result["is_valid"] = False
         if retry_count <= 1:
             result["message"] = "I'm having trouble finding your plan information. Let's try again with your insurance details."
@@ -138,7 +323,7 @@ def validate_insurance_eligibility(response_data, retry_count=0):
             result["needs_representative"] = True
         return result
     
-    if "errors" in response_data and response_data["errors"]:
+    if eligibility.has_errors:
         result["is_valid"] = False
         if retry_count <= 1:
             result["message"] = "There seems to be an issue with the insurance verification. Let's try again with your information."
@@ -148,57 +333,39 @@ def validate_insurance_eligibility(response_data, retry_count=0):
             result["needs_representative"] = True
         return result
     
-    # Option 2: Check if insurance is active
-    has_active_coverage = False
-    for plan in response_data.get("planStatus", []):
-        # Check if service type code "30" (Health Benefit Plan Coverage) exists
-        if "30" in plan.get("serviceTypeCodes", []):
-            # Check if status is "Active Coverage" or statusCode is "1"
-            if plan.get("status") == "Active Coverage" or plan.get("statusCode") == "1":
-                has_active_coverage = True
-                result["active_insurance"] = True
-                break
-    
-    if not has_active_coverage:
+    # Option 2: Check if insurance is active (service type 30, "Active Coverage" or statusCode "1")
+    if not eligibility.active_coverage:
         result["message"] = "Your insurance appears to be inactive. I'll connect you to a representative."
         result["needs_representative"] = True
         return result
+    result["active_insurance"] = True
     
-    # Option 3: Check for office visit copay in benefitsInformation
-    office_visit_copay = None
-    for benefit in response_data.get("benefitsInformation", []):
-        # Look for service type "98" (Professional/Physician Visit - Office)
-        if "98" in benefit.get("serviceTypeCodes", []):
-            # Check for code "B" (copay)
-            if benefit.get("code") == "B":
-                office_visit_copay = benefit
-                result["has_office_visit_coverage"] = True
-                result["copay_amount"] = benefit.get("benefitAmount")
-                break
-    
-    if not result["has_office_visit_coverage"]:
+    # Option 3: Check for office visit copay (service type 98, code "B")
+    if not eligibility.has_office_visit_coverage:
         result["message"] = "I couldn't find your coverage details for office visits. I'll transfer you to a representative."
         result["needs_representative"] = True
         return result
+    result["has_office_visit_coverage"] = True
+    result["copay_amount"] = eligibility.copay_amount
     
     # Option 4: Determine network status
-    if office_visit_copay:
-        network_indicator = office_visit_copay.get("inPlanNetworkIndicator")
-        network_code = office_visit_copay.get("inPlanNetworkIndicatorCode")
-        
-        if network_code == "Y" or network_indicator == "Yes":
-            result["network_status"] = "in-network"
-            result["message"] = f"Your copay for in-network office visits is {result['copay_amount']} dollars."
-            result["message"] += "Thank you for your patience. Have a good day"
-        elif network_code == "N" or network_indicator == "No":
-            result["network_status"] = "out-of-network"
-            result["message"] = "You have office visit coverage, but this provider is out-of-network under your plan."
-            result["message"] += "Thank you for your patience. Have a good day"
-        else:
-            result["network_status"] = "unknown"
-            result["message"] = "Your insurance doesn't specify if this provider is in-network. I'll connect you to a representative."
-            result["message"] += "Thank you for your patience. Connecting to a representative"
-            result["needs_representative"] = True
+    result["network_status"] = eligibility.network_status
+    if eligibility.network_status == "in-network":
+        result["message"] = f"Your copay for in-network office visits is {result['copay_amount']} dollars."
+        result["message"] += "Thank you for your patience. Have a good day"
+    elif eligibility.network_status == "out-of-network":
+        result["message"] = "You have office visit coverage, but this provider is out-of-network under your plan."
+        result["message"] += "Thank you for your patience. Have a good day"
+    else:
+        result["message"] = "Your insurance doesn't specify if this provider is in-network. I'll connect you to a representative."
+        result["message"] += "Thank you for your patience. Connecting to a representative"
+        result["needs_representative"] = True
         
-    print(result)
+    logger.info("Eligibility validated", extra=fields(
+        is_valid=result["is_valid"],
+        active_insurance=result["active_insurance"],
+        network_status=result["network_status"],
+        needs_representative=result["needs_representative"],
+        retry_validation=result["retry_validation"],
+    ))
     return result